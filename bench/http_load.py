@@ -0,0 +1,339 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from collections import defaultdict
+from datetime import datetime
+
+import click
+import requests
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Доли операций чтения/записи в наборах запросов(--mix)
+MIXES = {
+    'read': 0.0,
+    'mostly-read': 0.1,
+    'mixed': 0.3,
+    'write-heavy': 0.7
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+class Workload(object):
+    """Набор запросов к API.
+
+    Запросы чтения выбираются равновероятно из get_*, запросы
+    записи - из post_*. Id постов для запросов берутся из выборки
+    существующих постов, полученной при запуске.
+
+    """
+
+    def __init__(self, url: str, write_share: float, seed: int):
+        self.url = url
+        self.write_share = write_share
+        self.seed = seed
+        self.posts_id = []
+
+        self.reads = (self.get_posts, self.get_posts_page, self.get_comments,
+                      self.get_categories, self.get_statistic)
+        self.writes = (self.post_post, self.post_comment)
+
+    def prepare(self, session: requests.Session):
+        response = session.get(f'{self.url}/api/v1/posts',
+                               params={'limit': 500, 'fields': 'id', 'fast': 'true'})
+        response.raise_for_status()
+
+        self.posts_id = [post['id'] for post in response.json()['posts']]
+        if not self.posts_id:
+            raise click.ClickException('В БД нет постов. Заполните БД тестовыми данными '
+                                       '(python manage.py generate_data).')
+
+    def next_request(self, rng: random.Random):
+        if rng.random() < self.write_share:
+            return rng.choice(self.writes)(rng)
+
+        return rng.choice(self.reads)(rng)
+
+    def get_posts(self, rng):
+        return 'GET', '/api/v1/posts', {'params': {'limit': 50}}
+
+    def get_posts_page(self, rng):
+        return 'GET', '/api/v1/posts', {'params': {'limit': 50,
+                                                   'after_id': rng.choice(self.posts_id)}}
+
+    def get_comments(self, rng):
+        return 'GET', '/api/v1/comments', {'params': {'post_id': rng.choice(self.posts_id)}}
+
+    def get_categories(self, rng):
+        return 'GET', '/api/v1/categories', {}
+
+    def get_statistic(self, rng):
+        return 'GET', '/api/v1/statistic', {}
+
+    def post_post(self, rng):
+        return 'POST', '/api/v1/posts', {'data': {'user_id': rng.randint(1, 1000),
+                                                  'title': 'Benchmark post',
+                                                  'text': 'Benchmark post body ' * rng.randint(1, 20)}}
+
+    def post_comment(self, rng):
+        return 'POST', '/api/v1/comments', {'data': {'post_id': rng.choice(self.posts_id),
+                                                     'email': 'bench@example.com',
+                                                     'name': 'Benchmark',
+                                                     'text': 'Benchmark comment ' * rng.randint(1, 10)}}
+
+
+def percentile(values: list, rank: int):
+    """Процентиль отсортированного списка(метод ближайшего ранга)."""
+
+    index = max(0, -(-rank * len(values) // 100) - 1)
+
+    return values[index]
+
+
+def summarize(latencies: list, errors: int, duration: float):
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies),
+               'errors': errors,
+               'throughput': round(len(latencies) / duration, 2)}
+
+    if latencies:
+        for rank in PERCENTILES:
+            summary[f'p{rank}_ms'] = round(percentile(latencies, rank) * 1000, 3)
+        summary['mean_ms'] = round(sum(latencies) / len(latencies) * 1000, 3)
+        summary['max_ms'] = round(latencies[-1] * 1000, 3)
+
+    return summary
+
+
+def run_worker(workload: Workload, number: int, started: float, warmup: float,
+               finish: float, results: dict, lock: threading.Lock):
+    rng = random.Random(f'{workload.seed}:{number}')
+    session = requests.Session()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    while True:
+        method, path, kwargs = workload.next_request(rng)
+
+        request_started = time.perf_counter()
+        if request_started >= finish:
+            break
+
+        try:
+            response = session.request(method, workload.url + path, timeout=30, **kwargs)
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            failed = True
+
+        elapsed = time.perf_counter() - request_started
+
+        # Запросы прогрева не учитываются
+        if request_started - started < warmup:
+            continue
+
+        key = f'{method} {path}'
+        latencies[key].append(elapsed)
+        if failed:
+            errors[key] += 1
+
+    with lock:
+        for key, values in latencies.items():
+            results['latencies'][key].extend(values)
+            results['errors'][key] += errors[key]
+
+
+def run_load(workload: Workload, concurrency: int, duration: float, warmup: float):
+    """Метод выполнения нагрузки.
+
+    concurrency потоков выполняют запросы без пауз(следующий запрос
+    отправляется после получения ответа) в течение warmup + duration секунд.
+
+    Возвращает словарь результатов по ресурсам(см. summarize).
+
+    """
+
+    results = {'latencies': defaultdict(list), 'errors': defaultdict(int)}
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    finish = started + warmup + duration
+
+    workers = [threading.Thread(target=run_worker,
+                                args=(workload, number, started, warmup, finish, results, lock))
+               for number in range(concurrency)]
+
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    endpoints = {key: summarize(values, results['errors'][key], duration)
+                 for key, values in sorted(results['latencies'].items())}
+
+    total = summarize([value for values in results['latencies'].values() for value in values],
+                      sum(results['errors'].values()), duration)
+
+    return {'endpoints': endpoints, 'total': total}
+
+
+def compare(result: dict, baseline: dict, threshold: float):
+    """Метод сравнения результата с базовым.
+
+    Регрессия - рост p95 или снижение пропускной способности
+    ресурса более чем на threshold процентов.
+
+    Возвращает список строк с описанием регрессий.
+
+    """
+
+    regressions = []
+
+    for key, current in result['endpoints'].items():
+        previous = baseline['endpoints'].get(key)
+        if not previous or 'p95_ms' not in previous or 'p95_ms' not in current:
+            continue
+
+        p95_change = (current['p95_ms'] / previous['p95_ms'] - 1) * 100 if previous['p95_ms'] else 0
+        throughput_change = (1 - current['throughput'] / previous['throughput']) * 100 \
+            if previous['throughput'] else 0
+
+        if p95_change > threshold:
+            regressions.append(f'{key}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} мс '
+                               f'(+{p95_change:.1f}%)')
+        if throughput_change > threshold:
+            regressions.append(f'{key}: пропускная способность {previous["throughput"]} -> '
+                               f'{current["throughput"]} запросов/с (-{throughput_change:.1f}%)')
+
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(url: str, timeout: float):
+    """Запуск приложения(runserver.py) и ожидание его готовности."""
+
+    server = subprocess.Popen([sys.executable, 'runserver.py'], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise click.ClickException('Приложение завершилось при запуске '
+                                       f'(код {server.returncode}).')
+        try:
+            requests.get(f'{url}/api/v1/categories', timeout=1)
+            return server
+        except requests.RequestException:
+            time.sleep(0.5)
+
+    server.terminate()
+    raise click.ClickException(f'Приложение не ответило за {timeout} с.')
+
+
+@click.command(help='Нагрузочное тестирование API: задержки(p50/p95/p99), '
+                    'пропускная способность и ошибки по ресурсам')
+@click.option('--url', default='http://127.0.0.1:5000', show_default=True,
+              help='Адрес приложения')
+@click.option('--start/--no-start', default=True, show_default=True,
+              help='Запустить приложение(runserver.py) на время тестирования')
+@click.option('--mix', type=click.Choice(sorted(MIXES)), default='mostly-read', show_default=True,
+              help='Набор запросов(доля запросов записи)')
+@click.option('--write-share', type=float,
+              help='Доля запросов записи от 0 до 1(вместо --mix)')
+@click.option('--concurrency', '-c', type=int, default=8, show_default=True,
+              help='Количество одновременных клиентов')
+@click.option('--duration', '-d', type=float, default=30, show_default=True,
+              help='Длительность измерения, с')
+@click.option('--warmup', type=float, default=5, show_default=True,
+              help='Длительность прогрева(не учитывается), с')
+@click.option('--seed', type=int, default=0, show_default=True,
+              help='Начальное значение генератора случайных чисел')
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='Файл результата(JSON)')
+@click.option('--baseline', '-b', type=click.Path(exists=True, dir_okay=False),
+              help='Файл базового результата для сравнения(JSON)')
+@click.option('--threshold', type=float, default=10, show_default=True,
+              help='Допустимое ухудшение относительно базового результата, %')
+def main(url, start, mix, write_share, concurrency, duration, warmup, seed,
+         output, baseline, threshold):
+    if write_share is None:
+        write_share = MIXES[mix]
+        mix_name = mix
+    else:
+        mix_name = f'write-share={write_share}'
+
+    server = start_server(url, timeout=30) if start else None
+
+    try:
+        workload = Workload(url, write_share, seed)
+        workload.prepare(requests.Session())
+
+        click.echo(f'Нагрузка: {mix_name}, {concurrency} клиентов, '
+                   f'{warmup} с прогрев + {duration} с измерение')
+
+        result = run_load(workload, concurrency, duration, warmup)
+
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    result['meta'] = {'date': datetime.now().isoformat(timespec='seconds'),
+                      'revision': git_revision(),
+                      'python': platform.python_version(),
+                      'url': url,
+                      'mix': mix_name,
+                      'write_share': write_share,
+                      'concurrency': concurrency,
+                      'duration': duration,
+                      'warmup': warmup,
+                      'seed': seed}
+
+    click.echo(f'{"ресурс":<28}{"запросы":>10}{"ошибки":>8}{"запр/с":>10}'
+               f'{"p50 мс":>10}{"p95 мс":>10}{"p99 мс":>10}')
+    for key, summary in list(result['endpoints'].items()) + [('всего', result['total'])]:
+        click.echo(f'{key:<28}{summary["requests"]:>10}{summary["errors"]:>8}'
+                   f'{summary["throughput"]:>10}{summary.get("p50_ms", "-"):>10}'
+                   f'{summary.get("p95_ms", "-"):>10}{summary.get("p99_ms", "-"):>10}')
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True, ensure_ascii=False)
+        click.echo(f'Результат записан в {output}')
+
+    if baseline:
+        with open(baseline) as file:
+            baseline = json.load(file)
+
+        for name in ('write_share', 'concurrency', 'seed'):
+            if baseline['meta'].get(name) != result['meta'][name]:
+                click.echo(click.style(f'Параметр {name} базового результата отличается: '
+                                       f'{baseline["meta"].get(name)}', fg='yellow'))
+
+        regressions = compare(result, baseline, threshold)
+
+        if regressions:
+            click.echo(click.style('Ухудшение относительно базового результата:', fg='red'))
+            for regression in regressions:
+                click.echo(click.style(f'  {regression}', fg='red'))
+            sys.exit(1)
+
+        click.echo(click.style('Ухудшений относительно базового результата нет', fg='green'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime
+
+import click
+
+from flask_migrate import Migrate
+from flask_migrate import upgrade
+
+from sqlalchemy import text
+
+from blog import app
+from blog import db
+
+from blog.db_utils.comments import get_all_comments_for_post
+from blog.db_utils.posts import add_post
+from blog.db_utils.posts import get_all_posts
+from blog.db_utils.statistic import get_statistic
+
+from config import Config
+
+from synthetic_data import generate
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_PATH = os.path.join(ROOT, 'bench', 'micro_baseline.json')
+
+# Количество постов, для которых вызывается Post.to_dict за одно измерение
+TO_DICT_BATCH = 1000
+
+
+class Case(object):
+    """Измеряемый вызов.
+
+    name:     str       -  имя измерения
+    call:     callable  -  вызов без аргументов
+    items:    int       -  количество обработанных за вызов элементов
+                           (время и память делятся на items)
+    cleanup:  bool      -  освобождать сессию БД после вызова
+                           (как по завершении запроса к API)
+
+    """
+
+    def __init__(self, name: str, call, items: int = 1, cleanup: bool = True):
+        self.name = name
+        self.call = call
+        self.items = items
+        self.cleanup = cleanup
+
+
+def make_cases():
+    """Список измерений для текущего набора данных."""
+
+    post_id = db.session.execute(text('SELECT post_id FROM comments GROUP BY post_id '
+                                      'ORDER BY count(*) DESC, post_id LIMIT 1')).scalar()
+    tag = db.session.execute(text('SELECT tag FROM categories ORDER BY id LIMIT 1')).scalar()
+
+    posts = get_all_posts(limit=TO_DICT_BATCH)
+
+    return [
+        Case('get_all_posts', lambda: get_all_posts()),
+        Case('get_all_posts(limit=50)', lambda: get_all_posts(limit=50)),
+        Case('get_all_comments_for_post', lambda: get_all_comments_for_post(post_id=post_id)),
+        Case('get_statistic', lambda: get_statistic()),
+        Case('get_statistic(exact=True)', lambda: get_statistic(exact=True)),
+        Case('Post.to_dict', lambda: [post.to_dict() for post in posts],
+             items=len(posts), cleanup=False),
+        Case('add_post', lambda: add_post(user_id=1,
+                                          title='Benchmark post',
+                                          body='Benchmark post body',
+                                          tag=tag))
+    ]
+
+
+def measure(case: Case, min_time: float, allocation_runs: int):
+    """Метод измерения вызова.
+
+    Вызов повторяется, пока суммарное время не превысит min_time
+    (не менее 3 раз), и возвращается медиана времени. Выделение памяти
+    измеряется отдельными вызовами(tracemalloc замедляет выполнение):
+
+    peak_kib         -  максимальный объём памяти, выделенной во время вызова
+    retained_blocks  -  количество блоков памяти, выделенных вызовом
+                        и не освобождённых к его завершению(включая результат),
+                        а не общее количество выделений
+
+    Значения делятся на case.items.
+
+    """
+
+    def finish():
+        if case.cleanup:
+            db.session.remove()
+
+    case.call()
+    finish()
+
+    timings = []
+    while sum(timings) < min_time or len(timings) < 3:
+        started = time.perf_counter()
+        case.call()
+        timings.append(time.perf_counter() - started)
+        finish()
+
+    peaks = []
+    retained_blocks = []
+    for _ in range(allocation_runs):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        result = case.call()
+        after = tracemalloc.take_snapshot()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        retained_blocks.append(sum(stat.count_diff for stat in after.compare_to(before, 'filename')
+                          if stat.count_diff > 0))
+        del result
+        finish()
+
+    return {'calls': len(timings),
+            'median_us': round(statistics.median(timings) / case.items * 1e6, 3),
+            'min_us': round(min(timings) / case.items * 1e6, 3),
+            'peak_kib': round(statistics.median(peaks) / case.items / 1024, 3),
+            'retained_blocks': round(statistics.median(retained_blocks) / case.items, 1)}
+
+
+def prepare_dataset(size: int, seed: int, workers: int):
+    """Очистка таблиц и генерация набора данных из size постов."""
+
+    with app.app_context():
+        db.session.execute(text('TRUNCATE posts, comments, categories, tombstones RESTART IDENTITY'))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+    generate(scale=size / Config.SYNTHETIC_POSTS_PER_SCALE,
+             seed=seed,
+             workers=workers,
+             chunk_rows=Config.SYNTHETIC_CHUNK_ROWS)
+
+
+def compare(result: dict, baseline: dict, threshold: float):
+    """Метод сравнения с базовым результатом.
+
+    Регрессия - рост медианы времени или пиковой памяти
+    более чем на threshold процентов.
+
+    Возвращает список строк с описанием регрессий.
+
+    """
+
+    regressions = []
+
+    for size, cases in result['sizes'].items():
+        for name, current in cases.items():
+            previous = baseline['sizes'].get(size, {}).get(name)
+            if not previous:
+                continue
+
+            for metric in ('median_us', 'peak_kib'):
+                if previous[metric] and current[metric] > previous[metric] * (1 + threshold / 100):
+                    change = (current[metric] / previous[metric] - 1) * 100
+                    regressions.append(f'{name}[{size}]: {metric} {previous[metric]} -> '
+                                       f'{current[metric]} (+{change:.1f}%)')
+
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.command(help='Микробенчмарки методов blog/db_utils и сериализации')
+@click.option('--database-url', required=True,
+              help='Адрес отдельной БД для измерений(таблицы БД очищаются)')
+@click.option('--sizes', default='1000,10000,100000', show_default=True,
+              help='Размеры наборов данных(количество постов) через ","')
+@click.option('--seed', type=int, default=0, show_default=True,
+              help='Начальное значение генератора данных')
+@click.option('--workers', type=int, default=os.cpu_count(),
+              help='Количество процессов загрузки данных')
+@click.option('--min-time', type=float, default=0.5, show_default=True,
+              help='Минимальное суммарное время измерения вызова, с')
+@click.option('--allocation-runs', type=int, default=3, show_default=True,
+              help='Количество вызовов для измерения памяти')
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+              help='Файл результата(JSON)')
+@click.option('--baseline', '-b', type=click.Path(dir_okay=False), default=BASELINE_PATH,
+              show_default=True, help='Файл базового результата для сравнения(JSON)')
+@click.option('--save-baseline', is_flag=True,
+              help='Записать результат как базовый(в файл --baseline)')
+@click.option('--threshold', type=float, default=20, show_default=True,
+              help='Допустимое ухудшение относительно базового результата, %')
+@click.option('--yes', is_flag=True, help='Не запрашивать подтверждение очистки БД')
+def main(database_url, sizes, seed, workers, min_time, allocation_runs,
+         output, baseline, save_baseline, threshold, yes):
+    if database_url == Config.SQLALCHEMY_DATABASE_URI:
+        raise click.ClickException('Измерения очищают таблицы БД, '
+                                   'укажите БД, отличную от БД приложения.')
+
+    if not yes:
+        click.confirm(f'Таблицы постов, комментариев и категорий БД {database_url} '
+                      'будут очищены. Продолжить?', abort=True)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    Migrate(app, db)
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+
+    result = {'meta': {'date': datetime.now().isoformat(timespec='seconds'),
+                       'revision': git_revision(),
+                       'python': platform.python_version(),
+                       'seed': seed,
+                       'min_time': min_time},
+              'sizes': {}}
+
+    for size in [int(size) for size in sizes.split(',')]:
+        prepare_dataset(size, seed, workers)
+
+        cases = {}
+        with app.app_context():
+            for case in make_cases():
+                cases[case.name] = measure(case, min_time, allocation_runs)
+                click.echo(f'{size:>8} {case.name:<28} {cases[case.name]["median_us"]:>14} мкс '
+                           f'{cases[case.name]["peak_kib"]:>12} КиБ '
+                           f'{cases[case.name]["retained_blocks"]:>10} блоков не освобождено')
+            db.session.remove()
+
+        result['sizes'][str(size)] = cases
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+        click.echo(f'Результат записан в {output}')
+
+    if save_baseline:
+        with open(baseline, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+        click.echo(f'Базовый результат записан в {baseline}')
+        return
+
+    if not os.path.exists(baseline):
+        click.echo(f'Базовый результат {baseline} не найден, сравнение не выполняется')
+        return
+
+    with open(baseline) as file:
+        regressions = compare(result, json.load(file), threshold)
+
+    if regressions:
+        click.echo(click.style('Ухудшение относительно базового результата:', fg='red'))
+        for regression in regressions:
+            click.echo(click.style(f'  {regression}', fg='red'))
+        sys.exit(1)
+
+    click.echo(click.style('Ухудшений относительно базового результата нет', fg='green'))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,5 +6,3 @@ cd ..
 
 deactivate
 rm -r venv/
-rm -r migrations/
-
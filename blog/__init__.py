@@ -17,15 +17,23 @@ db = SQLAlchemy(app)
 api = swagger.docs(Api(app), apiVersion='0.1')
 
 
+from blog import metrics
 from blog import models
+from blog import slow_queries
 
 from blog.resources.categories import Categories
 from blog.resources.comments import Comments
+from blog.resources.comments_stream import CommentsStream
+from blog.resources.metrics import Metrics
 from blog.resources.posts import Posts
+from blog.resources.runtime import Runtime
 from blog.resources.statistic import Statistic
 
 api.add_resource(Categories, '/api/v1/categories')
 api.add_resource(Comments, '/api/v1/comments')
+api.add_resource(CommentsStream, '/api/v1/comments/stream')
+api.add_resource(Metrics, '/api/v1/metrics')
 api.add_resource(Posts, '/api/v1/posts')
+api.add_resource(Runtime, '/api/v1/runtime')
 api.add_resource(Statistic, '/api/v1/statistic')
 
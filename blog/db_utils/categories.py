@@ -1,14 +1,23 @@
 from loguru import logger
 
+from sqlalchemy import select
+
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import SQLAlchemyError
 
+from sqlalchemy.orm import load_only
+
 from sqlalchemy.orm.exc import NoResultFound
 
 from blog import db
 
-from blog.db_utils.posts import refresh_tag
+from blog.db_utils.common import iterate_in_chunks
+from blog.db_utils.counters import bump_counters
+from blog.db_utils.registry import category_registry
+from blog.db_utils.registry import notify_categories_changed
+from blog.db_utils.single_flight import single_flight
+from blog.db_utils.versions import bump_versions
 
 from blog.models import Category
 
@@ -32,6 +41,9 @@ def add_category(name: str, tag: str):
     db.session.add(category_for_add)
 
     try:
+        bump_counters(categories_count=1)
+        bump_versions('categories')
+        notify_categories_changed()
         db.session.commit()
 
     except IntegrityError as e:
@@ -50,10 +62,18 @@ def add_category(name: str, tag: str):
         logger.warning(f'Не удалось добавить новую категорию в БД. Причина: {str(e)}')
         raise Exception('БД временно недоступна')
 
+    category_registry.invalidate()
+
 
-def get_all_categories():
+def get_all_categories(stream: bool = False, fields: tuple = None):
     """Метод получения списка всех категорий из БД.
 
+    В качестве входных параметров принимает:
+
+    stream:  bool   -  потоковое чтение - опционально(default=False)
+    fields:  tuple  -  поля категории, которые необходимо загрузить - опционально
+                       (default=None - все поля, см. Category.FIELDS)
+
     Возвращает список всех категорий(список объектов Category).
     [
       {
@@ -65,13 +85,25 @@ def get_all_categories():
       {}
     ]
 
+    При stream=True вместо списка возвращается генератор
+    (см. iterate_in_chunks в blog/db_utils/common.py).
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением об ошибке.
 
     """
 
+    query = Category.query
+
+    if fields:
+        query = query.options(load_only(Category.id, *[getattr(Category, field) for field in fields]))
+
+    if stream:
+        return iterate_in_chunks(query.order_by(Category.id),
+                                 'Не удалось получить категории из БД.')
+
     try:
-        categories = Category.query.all()
+        categories = query.all()
     except SQLAlchemyError as e:
         logger.warning(f'Не удалось получить категории из БД. Причина: {str(e)}')
         raise Exception('БД временно недоступна')
@@ -79,6 +111,33 @@ def get_all_categories():
     return categories
 
 
+@single_flight
+def get_all_categories_rows(fields: tuple = None):
+    """Метод получения всех категорий из БД без создания объектов Category.
+
+    В качестве входного параметра принимает:
+
+    fields:  tuple  -  поля категории - опционально
+                       (default=None - все поля, см. Category.FIELDS)
+
+    Возвращает список словарей, совпадающих с Category.to_dict(fields).
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением об ошибке.
+
+    """
+
+    fields = fields or Category.FIELDS
+
+    try:
+        rows = db.session.execute(select([getattr(Category, field) for field in fields])).fetchall()
+    except SQLAlchemyError as e:
+        logger.warning(f'Не удалось получить категории из БД. Причина: {str(e)}')
+        raise Exception('БД временно недоступна')
+
+    return [dict(zip(fields, row)) for row in rows]
+
+
 def change_category(category_id: int, name: str = None, tag: str = None):
     """Метод редактирования категории.
 
@@ -88,51 +147,67 @@ def change_category(category_id: int, name: str = None, tag: str = None):
     name:         str  -  новое имя - опционально(default=None - имя сохраняется старое)
     tag:          str  -  новый тэг - опционально(default=None - тэг сохраняется старый)
 
+    Посты ссылаются на категорию по id, поэтому смена тэга
+    изменяет только одну строку таблицы categories.
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
+    values = {}
+
+    if name:
+        values['name'] = name
+    if tag:
+        values['tag'] = tag
+
     try:
-        category_for_change = Category.query.filter(Category.id == category_id).one()
+        if values:
+            changed = Category.query.filter(Category.id == category_id) \
+                                    .update(values, synchronize_session=False)
+        else:
+            changed = Category.query.filter(Category.id == category_id).count()
+
+        if not changed:
+            raise NoResultFound('Категория не найдена')
 
-        old_tag = None
+        if values:
+            bump_versions('categories')
 
-        if name:
-            category_for_change.name = name
+        # Реестр категорий зависит только от тэгов
         if tag:
-            old_tag = category_for_change.tag
-            category_for_change.tag = tag
+            notify_categories_changed()
 
         db.session.commit()
 
     except DataError as e:
+        db.session.rollback()
         logger.warning(f'Редактирование категории с id: {category_id} не удалось. '
                        f'Причина: {str(e)}')
         raise Exception('Ошибка при попытке редактирования. '
                         'Не корректный id категории.')
 
     except NoResultFound as e:
+        db.session.rollback()
         logger.warning(f'Редактирование категории с id: {category_id} не удалось. '
                        f'Причина: категория не найдена. Error massage: "{str(e)}"')
         raise Exception('Категория с данным id не найдена в БД')
 
     except IntegrityError as e:
+        db.session.rollback()
         logger.warning(f'Редактирование категории с id: {category_id} не удалось. '
                        f'Причина: не корректные данные. Error massage: "{str(e)}"')
         raise Exception('Ошибка при попытке редактирования. '
                         'Возможно данное имя или тэг уже заняты.')
 
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.warning(f'Редактирование категории с id: {category_id} не удалось. '
                        f'Причина: "{str(e)}"')
         raise Exception('БД временно недоступна')
 
-    # обновление тэга во всех постах, которые на него ссылались,
-    # если редактировался тэг
-    if old_tag:
-        refresh_tag(old_tag=old_tag,
-                    new_tag=tag)
+    category_registry.invalidate()
 
 
 def delete_category(category_id: int):
@@ -142,33 +217,43 @@ def delete_category(category_id: int):
 
     category_id:  int  -  id категории, которую необходимо удалить
 
+    Категория удаляется одним запросом, ссылки постов на неё
+    очищаются в БД(внешний ключ с ON DELETE SET NULL).
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
     try:
-        category_for_delete = Category.query.filter(Category.id == category_id).one()
-        deleted_tag = category_for_delete.tag
+        deleted = Category.query.filter(Category.id == category_id) \
+                                .delete(synchronize_session=False)
 
-        db.session.delete(category_for_delete)
+        if not deleted:
+            raise NoResultFound('Категория не найдена')
+
+        bump_counters(categories_count=-1)
+        bump_versions('categories', 'posts')
+        notify_categories_changed()
         db.session.commit()
 
     except DataError as e:
+        db.session.rollback()
         logger.warning('Ошибка при попытке удаления категории. '
                        f'Причина: не корректный id - {category_id}. '
                        f'Error message: {str(e)}')
         raise Exception('Проверьте корректость id удаляемой категории.')
 
     except NoResultFound as e:
+        db.session.rollback()
         logger.warning(f'Удаление категории с id: {category_id} не удалось. '
                        f'Причина: категория не найдена. Error message: "{str(e)}"')
         raise Exception('Проверьте корректость id удаляемой категории.')
 
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.warning(f'Удаление категории с id: {category_id} не удалось. '
                        f'Причина: "{str(e)}"')
         raise Exception('БД временно недоступна')
 
-    refresh_tag(deleted_tag, None)
-
+    category_registry.invalidate()
@@ -0,0 +1,139 @@
+from loguru import logger
+
+from sqlalchemy import text
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from blog import db
+
+from blog.db_utils.single_flight import single_flight
+
+from blog.models import Category
+from blog.models import Comment
+from blog.models import Post
+
+
+# Изменения после позиции since(id транзакции, номер изменения) в завершённых
+# транзакциях: транзакции с id меньше xmin снимка данных завершены, и все
+# их изменения уже видны, изменения остальных транзакций возвращаются
+# в следующих запросах. Один запрос(UNION ALL) выполняется в одном снимке
+# данных, каждая часть читает не более limit строк по индексу (change_xid, change_seq).
+CHANGES_QUERY = text('''
+    SELECT * FROM (
+        (SELECT p.change_xid, p.change_seq, 'posts' AS kind, p.id,
+                p.user_id AS number, p.category_id AS second_number,
+                p.title AS first, p.body AS second, c.tag AS third
+         FROM posts AS p LEFT OUTER JOIN categories AS c ON c.id = p.category_id
+         WHERE (p.change_xid, p.change_seq) > (:since_xid, :since_seq)
+           AND p.change_xid < txid_snapshot_xmin(txid_current_snapshot())
+           AND NOT p.is_draft
+         ORDER BY p.change_xid, p.change_seq
+         LIMIT :limit)
+        UNION ALL
+        (SELECT change_xid, change_seq, 'comments', id, post_id, NULL, email, name, body
+         FROM comments
+         WHERE (change_xid, change_seq) > (:since_xid, :since_seq)
+           AND change_xid < txid_snapshot_xmin(txid_current_snapshot())
+         ORDER BY change_xid, change_seq
+         LIMIT :limit)
+        UNION ALL
+        (SELECT change_xid, change_seq, 'categories', id, NULL, NULL, name, tag, NULL
+         FROM categories
+         WHERE (change_xid, change_seq) > (:since_xid, :since_seq)
+           AND change_xid < txid_snapshot_xmin(txid_current_snapshot())
+         ORDER BY change_xid, change_seq
+         LIMIT :limit)
+        UNION ALL
+        (SELECT change_xid, change_seq, 'tombstones', row_id, NULL, NULL, table_name, NULL, NULL
+         FROM tombstones
+         WHERE (change_xid, change_seq) > (:since_xid, :since_seq)
+           AND change_xid < txid_snapshot_xmin(txid_current_snapshot())
+         ORDER BY change_xid, change_seq
+         LIMIT :limit)
+    ) AS changes
+    ORDER BY change_xid, change_seq
+    LIMIT :limit
+''')
+
+
+@single_flight
+def get_changes(since_xid: int, since_seq: int, limit: int):
+    """Метод получения изменений постов, комментариев и категорий(лента изменений).
+
+    В качестве входных параметров принимает:
+
+    since_xid:  int  -  id транзакции последнего полученного изменения
+                        (watermark предыдущего ответа, 0 - все данные)
+    since_seq:  int  -  номер последнего полученного изменения(0 - все данные)
+    limit:      int  -  максимальное количество изменений
+
+    Каждая строка постов, комментариев и категорий хранит номер последнего
+    изменения(change_seq) и id изменившей её транзакции(change_xid),
+    удаление строки оставляет запись в таблице tombstones. Номера
+    присваиваются без блокировок, а изменения возвращаются только из
+    завершённых транзакций(id меньше xmin снимка данных) в порядке
+    (id транзакции, номер изменения), поэтому изменение до watermark
+    не может появиться после получения watermark.
+
+    Изменения одной транзакции могут разделяться между ответами:
+    следующий ответ продолжает транзакцию с изменения после watermark.
+
+    Тэг поста хранится в категории, смена тэга возвращается только
+    изменённой категорией: клиенты сопоставляют категории с постами
+    по category_id.
+
+    Изменения читаются одним запросом по индексам (change_xid, change_seq),
+    стоимость зависит только от limit и не зависит от размера транзакций.
+
+    Возвращает словарь:
+
+    {
+    'posts':       list  -  добавленные/изменённые посты(см. Post.to_dict
+                            и category_id), черновики не возвращаются
+    'comments':    list  -  добавленные/изменённые комментарии(см. Comment.to_dict)
+    'categories':  list  -  добавленные/изменённые категории(см. Category.to_dict)
+    'tombstones':  list  -  удалённые строки: {'table': str, 'id': int}
+    'watermark':   dict  -  позиция последнего возвращённого изменения:
+                            {'change_xid': int, 'change_seq': int}
+                            (since - если изменений нет)
+    'has_more':    bool  -  есть ли изменения после watermark
+    }
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    try:
+        rows = db.session.execute(CHANGES_QUERY, {'since_xid': since_xid,
+                                                  'since_seq': since_seq,
+                                                  'limit': limit + 1}).fetchall()
+
+    except SQLAlchemyError as e:
+        logger.warning(f'Не удалось получить изменения после ({since_xid}, {since_seq}). '
+                       f'Причина: {str(e)}')
+        raise Exception('БД временно недоступна')
+
+    changes = {'posts': [],
+               'comments': [],
+               'categories': [],
+               'tombstones': [],
+               'watermark': {'change_xid': since_xid, 'change_seq': since_seq},
+               'has_more': len(rows) > limit}
+
+    for change_xid, change_seq, kind, row_id, number, second_number, first, second, third \
+            in rows[:limit]:
+        if kind == 'posts':
+            post = dict(zip(Post.FIELDS, (row_id, number, first, second, third)))
+            post['category_id'] = second_number
+            changes['posts'].append(post)
+        elif kind == 'comments':
+            changes['comments'].append(dict(zip(Comment.FIELDS, (row_id, number, first, second, third))))
+        elif kind == 'categories':
+            changes['categories'].append(dict(zip(Category.FIELDS, (row_id, first, second))))
+        else:
+            changes['tombstones'].append({'table': first, 'id': row_id})
+
+        changes['watermark'] = {'change_xid': change_xid, 'change_seq': change_seq}
+
+    return changes
@@ -0,0 +1,207 @@
+import json
+import queue
+import threading
+
+from collections import defaultdict
+
+from loguru import logger
+
+from sqlalchemy import select
+
+from blog import app
+from blog import db
+
+from blog.db_utils.notifications import notify
+from blog.db_utils.notifications import subscribe
+
+from blog.models import Comment
+
+from config import Config
+
+
+NEW_COMMENT_CHANNEL = 'new_comment'
+
+
+class Subscription(object):
+    """Подписка на новые комментарии постов.
+
+    События читаются методом get. Если подписчик не успевает читать
+    события(очередь переполнена) - подписка закрывается.
+
+    """
+
+    def __init__(self, posts_id: set):
+        self.posts_id = posts_id
+        self.closed = False
+        self._events = queue.Queue(maxsize=Config.COMMENTS_STREAM_QUEUE_SIZE)
+
+    def get(self, timeout: float):
+        """Метод получения события.
+
+        Возвращает tuple(тип события, данные) или None,
+        если за timeout секунд событий не было.
+
+        Типы событий:
+
+        'comment'  -  новый комментарий(данные - JSON комментария, см. Comment.to_dict)
+        'reset'    -  уведомления могли быть потеряны(данные - None), клиенту
+                      необходимо получить комментарии запросом GET /api/v1/comments
+
+        """
+
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, event: tuple):
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+
+
+class CommentHub(object):
+    """Рассылка новых комментариев подписчикам процесса.
+
+    Метод add_comment отправляет уведомление PostgreSQL(NOTIFY)
+    с id комментария и id поста. Все подписки процесса обслуживаются
+    одним соединением LISTEN(см. subscribe в blog/db_utils/notifications.py),
+    поэтому подписчики не занимают соединения с БД.
+
+    Комментарий читается из БД один раз(в отдельном потоке, пачками)
+    и только если на его пост есть подписчики в данном процессе,
+    затем JSON комментария рассылается всем подписчикам поста.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+        self._pending = queue.Queue()
+        self._started = False
+
+    def subscribe(self, posts_id: set):
+        """Метод подписки на новые комментарии постов.
+
+        В качестве входного параметра принимает set id постов.
+
+        Возвращает объект Subscription, который необходимо
+        освободить методом unsubscribe.
+
+        """
+
+        if not self._started:
+            self._start()
+
+        subscription = Subscription(posts_id)
+
+        with self._lock:
+            for post_id in posts_id:
+                self._subscriptions[post_id].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Метод освобождения подписки."""
+
+        with self._lock:
+            for post_id in subscription.posts_id:
+                subscriptions = self._subscriptions.get(post_id)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[post_id]
+
+    def subscribers_count(self):
+        """Метод получения количества подписок процесса."""
+
+        with self._lock:
+            return len({subscription for subscriptions in self._subscriptions.values()
+                        for subscription in subscriptions})
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        threading.Thread(target=self._fetch_forever,
+                         name='comment-hub',
+                         daemon=True).start()
+
+        subscribe(NEW_COMMENT_CHANNEL, self._on_notification)
+
+    def _on_notification(self, payload: str):
+        # Вызывается в потоке уведомлений, обращение к БД - в потоке рассылки
+        if payload is None:
+            self._pending.put(None)
+            return
+
+        event = json.loads(payload)
+
+        with self._lock:
+            if event['post_id'] not in self._subscriptions:
+                return
+
+        self._pending.put(event['id'])
+
+    def _fetch_forever(self):
+        while True:
+            items = [self._pending.get()]
+            while not self._pending.empty():
+                items.append(self._pending.get_nowait())
+
+            if None in items:
+                self._publish_reset()
+
+            comments_id = [item for item in items if item is not None]
+            if not comments_id:
+                continue
+
+            try:
+                with app.app_context():
+                    rows = db.session.execute(select([getattr(Comment, field) for field in Comment.FIELDS])
+                                              .where(Comment.id.in_(comments_id))
+                                              .order_by(Comment.id)).fetchall()
+            except Exception as e:
+                logger.warning(f'Не удалось получить новые комментарии {comments_id}. '
+                               f'Причина: {str(e)}')
+                self._publish_reset()
+                continue
+
+            for row in rows:
+                comment = dict(zip(Comment.FIELDS, row))
+                self._publish(comment['post_id'], ('comment', json.dumps(comment)))
+
+    def _publish(self, post_id: int, event: tuple):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(post_id, ()))
+
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def _publish_reset(self):
+        with self._lock:
+            subscriptions = {subscription for subscriptions in self._subscriptions.values()
+                             for subscription in subscriptions}
+
+        for subscription in subscriptions:
+            subscription.put(('reset', None))
+
+
+comment_hub = CommentHub()
+
+
+def notify_new_comment(comment_id: int, post_id: int):
+    """Метод уведомления процессов о новом комментарии.
+
+    Вызывается методом add_comment перед commit,
+    уведомление доставляется только после успешного commit.
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    notify(NEW_COMMENT_CHANNEL, json.dumps({'id': comment_id, 'post_id': post_id}))
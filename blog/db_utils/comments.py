@@ -1,13 +1,29 @@
 from loguru import logger
 
+from sqlalchemy import any_
+from sqlalchemy import cast
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+
+from sqlalchemy.dialects.postgresql import ARRAY
+
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import SQLAlchemyError
 
+from sqlalchemy.orm import load_only
+
 from sqlalchemy.orm.exc import NoResultFound
 
 from blog import db
 
+from blog.db_utils.comment_hub import notify_new_comment
+from blog.db_utils.common import iterate_in_chunks
+from blog.db_utils.counters import bump_counters
+from blog.db_utils.single_flight import single_flight
+from blog.db_utils.versions import bump_versions
+
 from blog.models import Comment
 from blog.models import Post
 
@@ -22,43 +38,47 @@ def add_comment(post_id: int, email: str, name: str, body: str):
     name:      str  -   имя оставившего комментарий
     body:      str  -   текст комментария
 
-    Перед попыткой создать комментарий - происходит проверка существования
-    поста которому он адресован.
+    Существование поста, которому адресован комментарий, проверяется
+    внешним ключом comments.post_id при добавлении, без отдельного запроса.
 
-    В случае провала проверки существования поста или
+    После commit комментарий рассылается подписчикам поста
+    (см. CommentHub в blog/db_utils/comment_hub.py).
+
+    В случае отсутствия поста или
     возникновении ошибки при попытке создания комментария происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
     try:
-
-        # Проверка существования поста для которого добавляется комментарий
-        if not Post.query.filter(Post.id == post_id).count():
-            raise NoResultFound('Пост не найден.')
-
         comment_for_add = Comment(post_id=post_id,
                                   email=email,
                                   name=name,
                                   body=body)
 
         db.session.add(comment_for_add)
+        db.session.flush()
+        notify_new_comment(comment_for_add.id, post_id)
+        bump_counters(comment_count=1)
+        bump_versions('comments')
         db.session.commit()
 
     except DataError as e:
+        db.session.rollback()
         logger.warning('Не удалось создать комментарий. '
                        f'Причина: {str(e)}.')
         raise Exception('Не удалось создать комментарий. '
                         'Причина: не корректный id поста.')
 
-    except NoResultFound:
-        warning_massage = 'Не удалось создать комментарий. ' \
-                          f'Причина: пост с id: {post_id} не найден.'
-        logger.warning(warning_massage)
-        raise Exception(warning_massage)
-
     except IntegrityError as e:
         db.session.rollback()
+
+        if 'ForeignKeyViolation' in str(e):
+            warning_massage = 'Не удалось создать комментарий. ' \
+                              f'Причина: пост с id: {post_id} не найден.'
+            logger.warning(warning_massage)
+            raise Exception(warning_massage)
+
         logger.warning('Не удалось создать новый комментарий. '
                        f'Причина: {str(e)}')
         raise Exception('Не удалось создать новый комментарий. '
@@ -71,12 +91,15 @@ def add_comment(post_id: int, email: str, name: str, body: str):
         raise Exception('БД временно недоступна')
 
 
-def get_all_comments_for_post(post_id: int):
+def get_all_comments_for_post(post_id: int, stream: bool = False, fields: tuple = None):
     """Метод получения всех комментариев, адресованных определённому посту.
 
     В качестве входных параметров принимает:
 
-    post_id:  int  -  id поста, для которого необходимо найти все комментарии.
+    post_id:  int   -  id поста, для которого необходимо найти все комментарии.
+    stream:   bool  -  потоковое чтение - опционально(default=False)
+    fields:   tuple -  поля комментария, которые необходимо загрузить - опционально
+                       (default=None - все поля, см. Comment.FIELDS)
 
     Возвращает список всех комментариев(список объектов Comment) поста.
     [
@@ -91,17 +114,35 @@ def get_all_comments_for_post(post_id: int):
         {}
     ]
 
+    При stream=True вместо списка возвращается генератор
+    (см. iterate_in_chunks в blog/db_utils/common.py).
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
     try:
-        # Проверка существования поста для которого необходимо получить комментарии
-        if not Post.query.filter(Post.id == post_id).count():
-            raise NoResultFound('Пост не найден')
+        query = Comment.query.filter(Comment.post_id == post_id)
 
-        comments = Comment.query.filter(Comment.post_id == post_id).all()
+        if fields:
+            query = query.options(load_only(*comment_columns(fields)))
+
+        if stream:
+            # Проверка существования поста для которого необходимо получить комментарии
+            if not Post.query.filter(Post.id == post_id).count():
+                raise NoResultFound('Пост не найден')
+
+            return iterate_in_chunks(query.order_by(Comment.id),
+                                     'Не удалось получить комментарии адресованные '
+                                     f'посту с id: {post_id}.')
+
+        comments = query.order_by(Comment.id).all()
+
+        # Проверка существования поста нужна только для того,
+        # что бы отличить пост без комментариев от отсутствующего поста
+        if not comments and not Post.query.filter(Post.id == post_id).count():
+            raise NoResultFound('Пост не найден')
 
     except DataError as e:
         logger.warning(f'Не удалось получить комментарии адресованные посту с id: {post_id}. '
@@ -122,3 +163,173 @@ def get_all_comments_for_post(post_id: int):
 
     return comments
 
+
+@single_flight
+def get_all_comments_for_post_rows(post_id: int, fields: tuple = None):
+    """Метод получения всех комментариев поста без создания объектов Comment.
+
+    Принимает те же параметры, что и get_all_comments_for_post(кроме stream).
+
+    Комментарии выбираются Core запросом select(без identity map
+    и загрузки объектов).
+
+    Возвращает список словарей, совпадающих с Comment.to_dict(fields).
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    fields = fields or Comment.FIELDS
+
+    query = select([getattr(Comment, field) for field in fields]) \
+        .where(Comment.post_id == post_id) \
+        .order_by(Comment.id)
+
+    try:
+        rows = db.session.execute(query).fetchall()
+
+        if not rows and not Post.query.filter(Post.id == post_id).count():
+            raise NoResultFound('Пост не найден')
+
+    except DataError as e:
+        logger.warning(f'Не удалось получить комментарии адресованные посту с id: {post_id}. '
+                       f'Причина: {str(e)}.')
+        raise Exception('Не удалось получить комментарии адресованные посту. '
+                        f'Причина: Не корректный id - {post_id}.')
+
+    except NoResultFound as e:
+        logger.warning(f'Не удалось получить комментарии адресованные посту с id: {post_id}. '
+                       f'Причина: {str(e)}.')
+        raise Exception('Не удалось получить комментарии адресованные посту. '
+                        f'Причина: пост с id {post_id} не найден.')
+
+    except SQLAlchemyError as e:
+        logger.warning(f'Не удалось получить комментарии адресованные посту с id: {post_id}. '
+                       f'Причина: {str(e)}.')
+        raise Exception('БД временно недоступна')
+
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def get_comments_for_posts(posts_id: list, limit: int, after_ids: dict = None, fields: tuple = None):
+    """Метод получения комментариев нескольких постов одним запросом.
+
+    В качестве входных параметров принимает:
+
+    posts_id:   list  -  id постов(int), для которых необходимо получить комментарии
+    limit:      int   -  максимальное количество комментариев каждого поста
+    after_ids:  dict  -  {post_id: id комментария} - для каждого поста выборка
+                         начинается после данного комментария - опционально
+                         (default=None - с первого комментария)
+    fields:     tuple -  поля комментария, которые необходимо загрузить - опционально
+                         (default=None - все поля, см. Comment.FIELDS)
+
+    Возвращает словарь {post_id: список объектов Comment}, в котором
+    присутствуют все запрошенные посты(для постов без комментариев
+    или отсутствующих постов - пустой список). Комментарии
+    упорядочены по id.
+
+    Для каждого поста комментарии выбираются через LATERAL подзапрос
+    с условием `post_id = :post_id AND id > :after_id ORDER BY id LIMIT :limit`,
+    который обслуживается индексом comments(post_id, id), поэтому
+    стоимость запроса не зависит ни от количества комментариев поста,
+    ни от глубины пагинации.
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    after_ids = after_ids or {}
+
+    # Имена колонок берутся из модели, а не из запроса
+    names = [column.key for column in comment_columns(fields or Comment.FIELDS)]
+    columns = ', '.join(names)
+    lateral_columns = ', '.join(f'c.{name}' for name in names)
+
+    statement = text(f'SELECT {lateral_columns} '
+                     'FROM unnest(CAST(:posts_id AS integer[]), CAST(:after_ids AS integer[])) '
+                     'AS k(post_id, after_id) '
+                     'CROSS JOIN LATERAL ('
+                     f'SELECT {columns} FROM comments '
+                     'WHERE comments.post_id = k.post_id AND comments.id > k.after_id '
+                     'ORDER BY comments.id '
+                     'LIMIT :limit'
+                     ') AS c '
+                     'ORDER BY c.post_id, c.id')
+
+    params = {'posts_id': list(posts_id),
+              'after_ids': [after_ids.get(post_id, 0) for post_id in posts_id],
+              'limit': limit}
+
+    try:
+        comments = db.session.query(Comment).from_statement(statement).params(**params).all()
+
+    except DataError as e:
+        logger.warning(f'Не удалось получить комментарии адресованные постам с id: {posts_id}. '
+                       f'Причина: {str(e)}.')
+        raise Exception('Не удалось получить комментарии адресованные постам. '
+                        'Причина: не корректные id постов.')
+
+    except SQLAlchemyError as e:
+        logger.warning(f'Не удалось получить комментарии адресованные постам с id: {posts_id}. '
+                       f'Причина: {str(e)}.')
+        raise Exception('БД временно недоступна')
+
+    result = {post_id: [] for post_id in posts_id}
+    for comment in comments:
+        result[comment.post_id].append(comment)
+
+    return result
+
+
+def get_comments_count_for_posts(posts_id: list):
+    """Метод получения количества комментариев нескольких постов одним запросом.
+
+    В качестве входного параметра принимает:
+
+    posts_id:  list  -  id постов(int)
+
+    Возвращает словарь {post_id: количество комментариев}, в котором
+    присутствуют все запрошенные посты.
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    try:
+        rows = db.session.query(Comment.post_id, func.count(Comment.id)) \
+                         .filter(Comment.post_id == any_(cast(list(posts_id), ARRAY(db.Integer)))) \
+                         .group_by(Comment.post_id) \
+                         .all()
+
+    except SQLAlchemyError as e:
+        logger.warning('Не удалось получить количество комментариев постов. '
+                       f'Причина: {str(e)}.')
+        raise Exception('БД временно недоступна')
+
+    result = {post_id: 0 for post_id in posts_id}
+    result.update(rows)
+
+    return result
+
+
+def comment_columns(fields: tuple):
+    """Вспомогательный метод получения колонок комментария для загрузки.
+
+    В качестве входного параметра принимает:
+
+    fields:  tuple  -  поля комментария(из Comment.FIELDS)
+
+    Возвращает список атрибутов модели Comment: запрошенные поля,
+    а также id и post_id, которые необходимы для группировки
+    и пагинации.
+
+    """
+
+    columns = [Comment.id, Comment.post_id]
+    columns.extend(getattr(Comment, field) for field in fields if field not in ('id', 'post_id'))
+
+    return columns
@@ -0,0 +1,32 @@
+from loguru import logger
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+
+
+def iterate_in_chunks(query, warning_message: str):
+    """Вспомогательный метод потокового чтения результатов запроса.
+
+    В качестве входных параметров принимает:
+
+    query:            Query  -  запрос, результаты которого необходимо получить
+    warning_message:  str    -  сообщение для лога в случае ошибки
+
+    Возвращает генератор объектов запроса. Строки читаются из БД
+    порциями по Config.STREAM_CHUNK_SIZE через серверный курсор
+    (yield_per включает stream_results), поэтому в памяти одновременно
+    находится не больше одной порции.
+
+    Запрос выполняется при первой итерации. В случае ошибки
+    при обращении к БД происходит raise Exception с сообщением об ошибке.
+
+    """
+
+    try:
+        for row in query.yield_per(Config.STREAM_CHUNK_SIZE):
+            yield row
+
+    except SQLAlchemyError as e:
+        logger.warning(f'{warning_message} Причина: {str(e)}.')
+        raise Exception('БД временно недоступна')
@@ -0,0 +1,86 @@
+from sqlalchemy import func
+
+from sqlalchemy.dialects.postgresql import insert
+
+from blog import db
+
+from blog.models import Category
+from blog.models import Comment
+from blog.models import Counter
+from blog.models import Post
+
+
+COUNTERS_ID = 1
+
+
+def bump_counters(**deltas: int):
+    """Вспомогательный метод изменения счётчиков статистики.
+
+    В качестве входных параметров принимает именованные аргументы
+    с изменениями счётчиков(имена полей модели Counter):
+
+    post_count=1, comment_count=-5, ...
+
+    Выполняет один UPDATE без commit - метод вызывается перед
+    commit изменяющего данные метода, поэтому счётчики изменяются
+    в той же транзакции, что и данные.
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    values = {name: getattr(Counter, name) + delta
+              for name, delta in deltas.items() if delta}
+
+    if not values:
+        return
+
+    Counter.query.filter(Counter.id == COUNTERS_ID).update(values, synchronize_session=False)
+
+
+def recount_counters():
+    """Вспомогательный метод пересчёта счётчиков статистики.
+
+    Пересчитывает все счётчики по таблицам posts, categories и comments
+    и сохраняет их(при отсутствии строки счётчиков - создаёт её).
+
+    Строка счётчиков блокируется(SELECT ... FOR UPDATE) до подсчёта,
+    поэтому изменения, которые произойдут во время пересчёта,
+    будут учтены в счётчиках после его завершения.
+
+    Возвращает словарь статистики(см. метод to_dict класса Counter).
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    db.session.execute(insert(Counter.__table__)
+                       .values(id=COUNTERS_ID,
+                               post_count=0,
+                               draft_count=0,
+                               categories_count=0,
+                               comment_count=0)
+                       .on_conflict_do_nothing(index_elements=[Counter.id]))
+
+    counters = Counter.query.filter(Counter.id == COUNTERS_ID).with_for_update().one()
+
+    post_count = db.session.query(func.count(Post.id)).filter(Post.is_draft == False)
+    draft_count = db.session.query(func.count(Post.id)).filter(Post.is_draft == True)
+    categories_count = db.session.query(func.count(Category.id))
+    comment_count = db.session.query(func.count(Comment.id))
+
+    counts = db.session.query(post_count.as_scalar(),
+                              draft_count.as_scalar(),
+                              categories_count.as_scalar(),
+                              comment_count.as_scalar()).one()
+
+    counters.post_count, counters.draft_count, \
+        counters.categories_count, counters.comment_count = counts
+
+    statistic = counters.to_dict()
+
+    db.session.commit()
+
+    return statistic
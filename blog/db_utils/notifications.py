@@ -0,0 +1,183 @@
+import os
+import select
+import threading
+import time
+import uuid
+
+from collections import defaultdict
+
+import psycopg2
+
+from loguru import logger
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from sqlalchemy import text
+
+from blog import app
+from blog import db
+
+from config import Config
+
+
+_process_id = None
+_process_id_lock = threading.Lock()
+_callbacks = defaultdict(list)
+_new_channels = []
+_active_channels = set()
+_lock = threading.Lock()
+_listener = None
+
+
+def get_process_id():
+    """Идентификатор процесса, который отправляет уведомления.
+
+    Позволяет подписчикам отличать собственные уведомления от уведомлений
+    других процессов. Создаётся при первом обращении в каждом процессе,
+    поэтому процессы, созданные fork после импорта, получают разные
+    идентификаторы.
+
+    """
+
+    global _process_id
+
+    pid = os.getpid()
+
+    with _process_id_lock:
+        if _process_id is None or _process_id[0] != pid:
+            _process_id = (pid, uuid.uuid4().hex)
+
+        return _process_id[1]
+
+
+def notify(channel: str, payload: str = None):
+    """Метод отправки уведомления PostgreSQL(NOTIFY).
+
+    В качестве входных параметров принимает:
+
+    channel:  str  -  канал уведомления
+    payload:  str  -  текст уведомления - опционально(default=get_process_id())
+
+    Уведомление отправляется в текущей транзакции без commit
+    и доставляется подписчикам только после её успешного commit.
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    if payload is None:
+        payload = get_process_id()
+
+    db.session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                       {'channel': channel, 'payload': payload})
+
+
+def subscribe(channel: str, callback):
+    """Метод подписки на уведомления PostgreSQL(LISTEN).
+
+    В качестве входных параметров принимает:
+
+    channel:   str       -  канал уведомлений
+    callback:  callable  -  функция, которая вызывается с текстом уведомления
+                            (после начала прослушивания канала, в т.ч. после
+                            переподключения к БД, вызывается с None, т.к.
+                            предшествующие уведомления могли быть потеряны)
+
+    Все подписки процесса обслуживаются одним соединением
+    с БД в отдельном потоке, который запускается при первой подписке.
+    Функции вызываются в этом потоке и не должны обращаться к БД
+    через db.session.
+
+    """
+
+    global _listener
+
+    with _lock:
+        _callbacks[channel].append(callback)
+        _new_channels.append(channel)
+
+        if _listener is None:
+            _listener = threading.Thread(target=_listen_forever,
+                                         name='pg-listener',
+                                         daemon=True)
+            _listener.start()
+
+
+def is_listening(channel: str):
+    """Метод проверки доставки уведомлений канала.
+
+    В качестве входного параметра принимает:
+
+    channel:  str  -  канал уведомлений
+
+    Возвращает True, если уведомления канала в данный момент доставляются.
+
+    """
+
+    return channel in _active_channels
+
+
+def _dispatch(channel: str, payload):
+    with _lock:
+        callbacks = list(_callbacks[channel])
+
+    for callback in callbacks:
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.warning(f'Ошибка при обработке уведомления канала {channel}. '
+                           f'Причина: {str(e)}')
+
+
+def _listen(cursor, channels: set):
+    for channel in channels:
+        cursor.execute(f'LISTEN "{channel}"')
+
+    with _lock:
+        _active_channels.update(channels)
+
+    # Уведомления, отправленные до начала прослушивания канала, не получены
+    for channel in channels:
+        _dispatch(channel, None)
+
+
+def _listen_forever():
+    while True:
+        connection = None
+
+        try:
+            connection = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = connection.cursor()
+
+            while True:
+                with _lock:
+                    new_channels = set(_new_channels) - _active_channels
+                    _new_channels.clear()
+
+                if new_channels:
+                    _listen(cursor, new_channels)
+
+                if select.select([connection], [], [], Config.LISTEN_POLL_TIMEOUT) == ([], [], []):
+                    continue
+
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    _dispatch(notification.channel, notification.payload)
+
+        except Exception as e:
+            logger.warning('Соединение для получения уведомлений БД потеряно. '
+                           f'Причина: {str(e)}')
+
+        finally:
+            with _lock:
+                # После переподключения необходимо заново подписаться на все каналы
+                _new_channels.extend(_active_channels)
+                _active_channels.clear()
+
+            if connection is not None:
+                connection.close()
+
+        time.sleep(Config.LISTEN_RECONNECT_DELAY)
@@ -1,16 +1,33 @@
 from loguru import logger
 
+from sqlalchemy import any_
+from sqlalchemy import cast
+from sqlalchemy import select
+from sqlalchemy import text
+
+from sqlalchemy.dialects.postgresql import ARRAY
+
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import SQLAlchemyError
 
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm import noload
+
 from sqlalchemy.orm.exc import NoResultFound
 
 from blog import db
 
-from blog.db_utils.comments import get_all_comments_for_post
+from blog.db_utils.common import iterate_in_chunks
+from blog.db_utils.counters import bump_counters
+from blog.db_utils.registry import category_registry
+from blog.db_utils.single_flight import single_flight
+from blog.db_utils.versions import bump_versions
 
 from blog.models import Category
+from blog.models import Comment
 from blog.models import Post
 
 from config import Config
@@ -40,18 +57,26 @@ def add_post(user_id: int, title: str, body: str, is_draft: bool = False, tag: s
 
     try:
 
-        # Проверка существования категории с данным тэгом.
+        # Поиск категории с данным тэгом.
         # только в случае наличия тэга во входящих аргументах
-        if tag and not Category.query.filter(Category.tag == tag).count():
-            raise NoResultFound(f'Категория с тэгом {tag} не найдена')
+        category_id = None
+        if tag:
+            category_id = get_category_id(tag)
 
         post_for_add = Post(user_id=user_id,
                             title=title,
                             body=body,
                             is_draft=is_draft,
-                            tag=tag)
+                            category_id=category_id)
 
         db.session.add(post_for_add)
+
+        if is_draft:
+            bump_counters(draft_count=1)
+        else:
+            bump_counters(post_count=1)
+
+        bump_versions('posts')
         db.session.commit()
 
     except NoResultFound as e:
@@ -64,6 +89,12 @@ def add_post(user_id: int, title: str, body: str, is_draft: bool = False, tag: s
         db.session.rollback()
         logger.warning('Не удалось создать пост с предоставленными данными. '
                        f'Причина: {str(e)}')
+
+        # Категория могла быть удалена после чтения реестра
+        if 'ForeignKeyViolation' in str(e):
+            raise Exception('Не корректные данные. '
+                            'Категория с данным тэгом не найдена.')
+
         raise Exception('Не корректные данные. '
                         'Проверьте наличие всех обязательных полей в запросе.')
 
@@ -88,11 +119,137 @@ def add_post(user_id: int, title: str, body: str, is_draft: bool = False, tag: s
         raise Exception('БД временно недоступна')
 
 
-def get_all_posts():
+def add_posts(posts: list):
+    """Метод пакетного добавления постов в БД.
+
+    В качестве входного параметра принимает список пар(номер поста
+    в запросе, проверенные значения колонок поста):
+
+    [
+        (0, {
+            'user_id':   int   -  id пользователя создающего пост
+            'title':     str   -  заголовок поста
+            'body':      str   -  текст поста
+            'is_draft':  bool  -  пометка "черновик"
+            'tag':       str   -  тэг категории или None
+            }),
+        ... ,
+        ()
+    ]
+
+    Значения проверяются вызывающим методом(схемой POST запроса
+    создания поста), тэги - по реестру категорий процесса. Посты
+    добавляются командами INSERT ... SELECT FROM unnest(порциями по
+    Config.POSTS_BATCH_INSERT_CHUNK) в одной транзакции.
+
+    Возвращает список результатов в порядке входящих постов
+    (index - номер поста в запросе):
+    [
+        {'index': 0, 'status': 'created', 'id': 101},
+        {'index': 1, 'status': 'error', 'message': '...'},
+        ... ,
+        {}
+    ]
+
+    В случае ошибки при обращении к БД ни один пост не добавляется
+    и происходит raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    results = {}
+
+    try:
+        # Проверка существования категорий всех постов по реестру категорий
+        # (отсутствующие в реестре тэги проверяются одним запросом)
+        tags = {values['tag'] for _, values in posts if values['tag']}
+        categories_id = category_registry.get_ids(tags)
+
+        rows = []
+        for index, values in posts:
+            tag = values['tag']
+
+            if tag and categories_id[tag] is None:
+                results[index] = {'index': index,
+                                  'status': 'error',
+                                  'message': 'Не корректные данные. '
+                                             'Категория с данным тэгом не найдена.'}
+                continue
+
+            rows.append((index, dict(values, category_id=categories_id.get(tag))))
+
+        # Порядок строк INSERT ... VALUES ... RETURNING не гарантирован,
+        # поэтому строки вставляются явно в порядке номеров(ORDER BY ordinality)
+        statement = text('''
+            INSERT INTO posts (user_id, title, body, is_draft, category_id)
+            SELECT user_id, title, body, is_draft, category_id
+            FROM unnest(CAST(:user_ids AS integer[]),
+                        CAST(:titles AS text[]),
+                        CAST(:bodies AS text[]),
+                        CAST(:is_drafts AS boolean[]),
+                        CAST(:categories_id AS integer[]))
+                 WITH ORDINALITY AS new_posts(user_id, title, body, is_draft, category_id, ordinality)
+            ORDER BY ordinality
+            RETURNING id
+        ''')
+
+        chunk_size = Config.POSTS_BATCH_INSERT_CHUNK
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+
+            result = db.session.execute(statement,
+                                        {'user_ids': [values['user_id'] for _, values in chunk],
+                                         'titles': [values['title'] for _, values in chunk],
+                                         'bodies': [values['body'] for _, values in chunk],
+                                         'is_drafts': [values['is_draft'] for _, values in chunk],
+                                         'categories_id': [values['category_id']
+                                                           for _, values in chunk]})
+
+            for (index, _), (post_id,) in zip(chunk, result.fetchall()):
+                results[index] = {'index': index, 'status': 'created', 'id': post_id}
+
+        drafts_count = sum(1 for _, values in rows if values['is_draft'])
+        bump_counters(post_count=len(rows) - drafts_count,
+                      draft_count=drafts_count)
+
+        if rows:
+            bump_versions('posts')
+
+        db.session.commit()
+
+    except (DataError, IntegrityError) as e:
+        db.session.rollback()
+        logger.warning('Не удалось создать посты с предоставленными данными. '
+                       f'Причина: {str(e)}')
+        raise Exception('Не корректные данные. '
+                        'Ни один пост не создан, проверьте корректность данных.')
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.warning('Не удалось создать новые посты. '
+                       f'Причина: {str(e)}')
+        raise Exception('БД временно недоступна')
+
+    return [results[index] for index, _ in posts]
+
+
+def get_all_posts(limit: int = None,
+                  after_id: int = None,
+                  stream: bool = False,
+                  fields: tuple = None):
     """Метод получения всех постов из БД.
 
-    Возвращает список всех постов(список объектов Post),
-    не отмеченных как "черновик".
+    В качестве входных параметров принимает:
+
+    limit:     int  -  максимальное количество постов - опционально
+                       (default=None - без ограничения)
+    after_id:  int  -  id поста, после которого начинается выборка -
+                       опционально(default=None - с начала)
+    stream:    bool  - потоковое чтение - опционально(default=False)
+    fields:    tuple - поля поста, которые необходимо загрузить - опционально
+                       (default=None - все поля, см. Post.FIELDS)
+
+    Возвращает список постов(список объектов Post),
+    не отмеченных как "черновик", упорядоченный по id.
     [
         {
         id:        int,
@@ -106,13 +263,35 @@ def get_all_posts():
         {}
     ]
 
+    Пагинация происходит по ключу(keyset): условие `id > after_id`
+    вместе с сортировкой по id обслуживается индексом, поэтому
+    стоимость получения любой страницы одинакова.
+
+    При stream=True вместо списка возвращается генератор
+    (см. iterate_in_chunks в blog/db_utils/common.py).
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
     try:
-        posts = Post.query.filter(Post.is_draft == False).all()
+        query = Post.query.options(*post_load_options(fields)) \
+                          .filter(Post.is_draft == False)
+
+        if after_id is not None:
+            query = query.filter(Post.id > after_id)
+
+        query = query.order_by(Post.id)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        if stream:
+            return iterate_in_chunks(query, 'Ошибка при попытке получить все посты из БД.')
+
+        posts = query.all()
+
     except SQLAlchemyError as e:
         logger.warning('Ошибка при попытке получить все посты из БД. '
                        f'Причина: {str(e)}.')
@@ -121,6 +300,51 @@ def get_all_posts():
     return posts
 
 
+@single_flight
+def get_all_posts_rows(limit: int = None, after_id: int = None, fields: tuple = None):
+    """Метод получения всех постов из БД без создания объектов Post.
+
+    Принимает те же параметры, что и get_all_posts(кроме stream).
+
+    Посты выбираются Core запросом select(без identity map и
+    загрузки объектов), соединение с таблицей categories
+    выполняется только при запросе поля tag.
+
+    Возвращает список словарей, совпадающих с Post.to_dict(fields).
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    fields = fields or Post.FIELDS
+
+    columns = [Category.tag if field == 'tag' else getattr(Post, field) for field in fields]
+
+    query = select(columns).where(Post.is_draft == False)
+
+    if 'tag' in fields:
+        query = query.select_from(Post.__table__.outerjoin(Category.__table__))
+
+    if after_id is not None:
+        query = query.where(Post.id > after_id)
+
+    query = query.order_by(Post.id)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    try:
+        rows = db.session.execute(query).fetchall()
+
+    except SQLAlchemyError as e:
+        logger.warning('Ошибка при попытке получить все посты из БД. '
+                       f'Причина: {str(e)}.')
+        raise Exception('БД временно недоступна')
+
+    return [dict(zip(fields, row)) for row in rows]
+
+
 def delete_posts(*args: int):
     """Метод удаления постов из БД.
 
@@ -129,37 +353,67 @@ def delete_posts(*args: int):
     *args:  int  -  id постов, которые необходимо удалить
                     (в качестве разделителя id использовать ',')
 
+    Посты и адресованные им комментарии удаляются двумя
+    запросами `DELETE ... WHERE id = ANY(:ids)` в одной транзакции,
+    независимо от количества id.
+
+    Возвращает словарь:
+
+    {
+    'deleted':    list  -  id удалённых постов
+    'not_found':  list  -  id постов, которые не найдены в БД
+    }
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
+    posts_id = cast(list(args), ARRAY(db.Integer))
+
     try:
-        for post_id in args:
-            try:
-                post = Post.query.filter(Post.id == post_id).one()
-                comments = get_all_comments_for_post(post_id)
+        comments_result = db.session.execute(Comment.__table__.delete()
+                                             .where(Comment.post_id == any_(posts_id)))
+
+        result = db.session.execute(Post.__table__.delete()
+                                    .where(Post.id == any_(posts_id))
+                                    .returning(Post.id, Post.is_draft))
+        rows = result.fetchall()
+        deleted = {row.id for row in rows}
+        deleted_drafts = sum(1 for row in rows if row.is_draft)
 
-                db.session.delete(post)
-                for comment in comments:
-                    db.session.delete(comment)
+        bump_counters(post_count=-(len(rows) - deleted_drafts),
+                      draft_count=-deleted_drafts,
+                      comment_count=-comments_result.rowcount)
 
-            except NoResultFound as e:
-                logger.warning(f'Пост c id: {post_id} не удалён. '
-                               f'Причина: {str(e)}')
+        if rows:
+            bump_versions('posts', 'comments')
 
         db.session.commit()
 
     except DataError as e:
+        db.session.rollback()
         logger.warning(f'Ошибка при попытке удаления постов: {[*args]}. '
                        f'Причина: {str(e)}.')
         raise Exception('Проверьте корректность параметра posts_id')
 
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.warning(f'Ошибка при попытке удаления постов: {[*args]}. '
                        f'Причина: {str(e)}.')
         raise Exception('БД временно недоступна')
 
+    # После успешного запроса все id гарантированно приводятся к int
+    requested = sorted({int(post_id) for post_id in args})
+    not_found = [post_id for post_id in requested if post_id not in deleted]
+
+    if not_found:
+        logger.warning(f'Посты c id: {not_found} не удалены. '
+                       'Причина: посты не найдены.')
+
+    return {'deleted': sorted(deleted),
+            'not_found': not_found}
+
 
 def change_post_tag(post_id: int, tag: str):
     """Метод добавления/изменения тэга поста
@@ -169,6 +423,10 @@ def change_post_tag(post_id: int, tag: str):
     post_id:  int  -  id поста, которому необходимо заменить тэг
     tag:      str  -  тэг(при None значении - тэг поста будет удалён)
 
+    Тэг заменяется одним запросом UPDATE ... RETURNING, без
+    предварительной загрузки поста. Существование категории
+    дополнительно гарантирует внешний ключ posts.category_id.
+
     При невозможности смены тэга происходит raise Exceptions
     с сообщением соответствующим причине ошибки.
 
@@ -176,22 +434,33 @@ def change_post_tag(post_id: int, tag: str):
 
     try:
 
-        # Проверка на существование категории с данным тэгом
-        if tag and not Category.query.filter(Category.tag == tag).count():
-            raise NoResultFound(f'Категория с тэгом {tag} не найдена')
+        # Поиск категории с данным тэгом
+        category_id = None
+        if tag:
+            category_id = get_category_id(tag)
+
+        changed = db.session.execute(
+            Post.__table__.update()
+                          .where(Post.id == post_id)
+                          .values(category_id=category_id)
+                          .returning(Post.id)
+        ).fetchone()
 
-        post_for_change_tag = Post.query.filter(Post.id == post_id).one()
-        post_for_change_tag.tag = tag
+        if changed is None:
+            raise NoResultFound('Пост не найден')
 
+        bump_versions('posts')
         db.session.commit()
 
     except DataError as e:
+        db.session.rollback()
         logger.warning(f'Тэг для поста с id: {post_id}  на новый тэг "{tag}" не изменён. '
                        f'Причина: {str(e)} ')
         raise Exception('Не удалось заменить тэг поста. '
                         'Причина: не корректный id поста.')
 
-    except NoResultFound as e:
+    except (NoResultFound, IntegrityError) as e:
+        db.session.rollback()
         logger.warning(f'Тэг для поста с id: {post_id}  на новый тэг "{tag}" не изменён. '
                        f'Причина: {str(e)} ')
         raise Exception('Не удалось заменить тэг поста. '
@@ -199,10 +468,39 @@ def change_post_tag(post_id: int, tag: str):
                         'и существование предоставленного тэга')
 
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.warning(f'Тэг для поста с id: {post_id} не изменён. Причина: {str(e)}')
         raise Exception('БД временно недоступна')
 
 
+def post_load_options(fields: tuple = None):
+    """Вспомогательный метод получения опций загрузки полей поста.
+
+    В качестве входного параметра принимает:
+
+    fields:  tuple  -  поля поста(из Post.FIELDS), которые необходимо
+                       загрузить(при None - загружаются все поля)
+
+    Возвращает список опций для Query.options: в SELECT попадают
+    только колонки запрошенных полей(и id), а соединение
+    с таблицей categories выполняется только при запросе поля tag.
+
+    """
+
+    if not fields:
+        return []
+
+    columns = [getattr(Post, field) for field in fields if field not in ('id', 'tag')]
+    options = [load_only(Post.id, *columns)]
+
+    if 'tag' in fields:
+        options.append(joinedload(Post.category).load_only(Category.tag))
+    else:
+        options.append(noload(Post.category))
+
+    return options
+
+
 def get_posts_with_tag(tag: str):
     """Вспомогательный метод получения всех постов категории.
 
@@ -231,7 +529,10 @@ def get_posts_with_tag(tag: str):
     """
 
     try:
-        posts = Post.query.filter(Post.tag == tag).all()
+        posts = Post.query.join(Post.category) \
+                          .options(contains_eager(Post.category)) \
+                          .filter(Category.tag == tag) \
+                          .all()
     except SQLAlchemyError as e:
         logger.warning(f'Не удалось получить посты, отмеченные тэгом: {tag}. '
                        f'Причина: {str(e)}.')
@@ -240,38 +541,25 @@ def get_posts_with_tag(tag: str):
     return posts
 
 
-def refresh_tag(old_tag: str, new_tag: str):
-    """Вспомогательный метод для обновления тэгов в постах.
+def get_category_id(tag: str):
+    """Вспомогательный метод получения id категории по тэгу.
 
-    В качестве входных параметров принимает:
+    В качестве входного параметра принимает:
 
-    old_tag:  str  -  тэг который необходимо заменить
-    new_tag:  str  -  тэг на который необходимо заменить
-                      (при None значении - всем постам, которые
-                      ссылались на данную категорию, удаляется тэг)
+    tag:  str  -  тэг категории
 
-    Метод используется после редактирования тэга
-    какой-либо категории либо при удалении категории
-    для обновления тэга в постах на актуальный или удаления.
+    Возвращает id категории. Тэг проверяется по реестру категорий
+    процесса(см. blog/db_utils/registry.py) без обращения к БД.
 
-    В случае ошибки выводит информацию о причине
-    в консоль с помощью logger.
+    При отсутствии категории с данным тэгом происходит raise NoResultFound.
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
 
     """
 
-    try:
-        posts = get_posts_with_tag(old_tag)
-
-        for post in posts:
-            post.tag = new_tag
-
-        db.session.commit()
+    category_id = category_registry.get_id(tag)
 
-    except SQLAlchemyError as e:
-        logger.warning(f'Не удалось обновить тэги постам, отмеченным тэгом: {old_tag}. '
-                       f'Причина: {str(e)}.')
-
-    except Exception as e:
-        logger.warning(f'Не удалось обновить тэги постам, отмеченным тэгом: {old_tag}. '
-                       f'Причина: {str(e)}.')
+    if category_id is None:
+        raise NoResultFound(f'Категория с тэгом {tag} не найдена')
 
+    return category_id
@@ -0,0 +1,184 @@
+import threading
+
+from sqlalchemy import any_
+from sqlalchemy import cast
+
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from blog import db
+
+from blog.db_utils.notifications import get_process_id
+from blog.db_utils.notifications import is_listening
+from blog.db_utils.notifications import notify
+from blog.db_utils.notifications import subscribe
+
+from blog.models import Category
+
+
+CATEGORIES_CHANNEL = 'categories_changed'
+
+
+class CategoryRegistry(object):
+    """Реестр категорий(тэг -> id категории) в памяти процесса.
+
+    Реестр загружается из БД одним запросом при первом обращении
+    и используется для проверки тэгов без обращения к БД.
+
+    Методы изменения категорий(blog/db_utils/categories.py) сбрасывают
+    реестр своего процесса после commit и отправляют уведомление
+    PostgreSQL(NOTIFY) в той же транзакции, по которому реестр
+    сбрасывается в остальных процессах.
+
+    Пока уведомления не доставляются(нет соединения LISTEN),
+    реестр не используется и тэги проверяются запросом к БД.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._categories = None
+        self._generation = 0
+        self._subscribed = False
+
+    def get_id(self, tag: str):
+        """Метод получения id категории по тэгу.
+
+        В качестве входного параметра принимает:
+
+        tag:  str  -  тэг категории
+
+        Возвращает id категории или None при отсутствии категории
+        с данным тэгом.
+
+        Отсутствующий в реестре тэг дополнительно проверяется запросом
+        к БД(категория могла быть создана другим процессом, уведомление
+        о чём ещё не получено).
+
+        Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+        вызывающим методом.
+
+        """
+
+        if not self._subscribed:
+            self._subscribe()
+
+        if not is_listening(CATEGORIES_CHANNEL):
+            return self._query(tag)
+
+        categories = self._categories
+        if categories is None:
+            categories = self._load()
+
+        category_id = categories.get(tag)
+
+        if category_id is None:
+            category_id = self._query(tag)
+
+            if category_id is not None:
+                self.invalidate()
+
+        return category_id
+
+    def get_ids(self, tags):
+        """Метод получения id категорий по нескольким тэгам.
+
+        В качестве входного параметра принимает:
+
+        tags:  iterable  -  тэги категорий
+
+        Возвращает словарь {тэг: id категории или None}.
+
+        Отсутствующие в реестре тэги(или все тэги, пока реестр
+        не используется) проверяются одним запросом к БД.
+
+        Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+        вызывающим методом.
+
+        """
+
+        if not self._subscribed:
+            self._subscribe()
+
+        categories = {}
+        listening = is_listening(CATEGORIES_CHANNEL)
+
+        if listening:
+            categories = self._categories
+            if categories is None:
+                categories = self._load()
+
+        result = {tag: categories.get(tag) for tag in tags}
+
+        missing = [tag for tag, category_id in result.items() if category_id is None]
+        if missing:
+            found = self._query_many(missing)
+            result.update(found)
+
+            if found and listening:
+                self.invalidate()
+
+        return result
+
+    def invalidate(self, payload: str = None):
+        """Метод сброса реестра.
+
+        Следующее обращение к реестру загрузит категории из БД.
+        Уведомления, отправленные данным процессом, игнорируются,
+        т.к. реестр уже сброшен после commit.
+
+        """
+
+        if payload == get_process_id():
+            return
+
+        with self._lock:
+            self._categories = None
+            self._generation += 1
+
+    def _subscribe(self):
+        with self._lock:
+            if self._subscribed:
+                return
+            self._subscribed = True
+
+        subscribe(CATEGORIES_CHANNEL, self.invalidate)
+
+    def _load(self):
+        generation = self._generation
+
+        categories = dict(db.session.query(Category.tag, Category.id).all())
+
+        # Если реестр был сброшен во время загрузки - загруженные
+        # данные могут быть устаревшими и не сохраняются
+        with self._lock:
+            if generation == self._generation:
+                self._categories = categories
+
+        return categories
+
+    @staticmethod
+    def _query(tag: str):
+        return db.session.query(Category.id).filter(Category.tag == tag).scalar()
+
+    @staticmethod
+    def _query_many(tags: list):
+        return dict(db.session.query(Category.tag, Category.id)
+                    .filter(Category.tag == any_(cast(tags, ARRAY(db.String))))
+                    .all())
+
+
+category_registry = CategoryRegistry()
+
+
+def notify_categories_changed():
+    """Метод уведомления процессов об изменении категорий.
+
+    Вызывается методами изменения категорий перед commit,
+    уведомление доставляется только после успешного commit.
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    notify(CATEGORIES_CHANNEL)
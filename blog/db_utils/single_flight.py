@@ -0,0 +1,135 @@
+import functools
+import threading
+
+from collections import defaultdict
+
+from blog.db_utils.versions import subscribe_changes
+
+from config import Config
+
+
+class _Call(object):
+    """Выполняющийся вызов метода, результат которого ожидают другие потоки."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_stats = defaultdict(lambda: {'calls': 0, 'coalesced': 0})
+_lock = threading.Lock()
+_subscribed = False
+
+
+def single_flight(method):
+    """Декоратор объединения одинаковых одновременных вызовов метода чтения.
+
+    Если метод с теми же аргументами уже выполняется в другом потоке
+    процесса, вызов не обращается к БД, а ожидает завершения
+    выполняющегося вызова и возвращает его результат(или возбуждает
+    то же исключение).
+
+    Результат разделяется между потоками, поэтому декоратор применяется
+    только к методам, возвращающим данные без привязки к сессии
+    (словари, списки), а вызывающий код не должен изменять результат.
+
+    После commit изменений данных(см. subscribe_changes
+    в blog/db_utils/versions.py) новые вызовы не присоединяются
+    к вызовам, начатым до изменения.
+
+    Вызовы с не хешируемыми аргументами выполняются как обычно.
+
+    """
+
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not Config.SINGLE_FLIGHT_ENABLED:
+            return method(*args, **kwargs)
+
+        if not _subscribed:
+            _subscribe()
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+
+        try:
+            hash(key)
+        except TypeError:
+            return method(*args, **kwargs)
+
+        with _lock:
+            _stats[name]['calls'] += 1
+
+            call = _calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = _calls[key] = _Call()
+            else:
+                _stats[name]['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = method(*args, **kwargs)
+
+        except BaseException as e:
+            call.error = e
+            raise
+
+        finally:
+            with _lock:
+                if _calls.get(key) is call:
+                    del _calls[key]
+
+            call.done.set()
+
+        return call.result
+
+    return wrapper
+
+
+def single_flight_stats():
+    """Метод получения счётчиков объединения вызовов.
+
+    Возвращает словарь, ключи которого - имена методов:
+
+    {
+    '<метод>':  {
+                'calls':      int  -  вызовы метода,
+                'coalesced':  int  -  вызовы, получившие результат
+                                      другого выполняющегося вызова
+                }
+    }
+
+    """
+
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def _forget_calls(tables):
+    # Вызовы, начатые до изменения данных, завершатся как обычно,
+    # но новые вызовы к ним не присоединятся
+    with _lock:
+        _calls.clear()
+
+
+def _subscribe():
+    global _subscribed
+
+    with _lock:
+        if _subscribed:
+            return
+        _subscribed = True
+
+    subscribe_changes(_forget_calls)
@@ -1,15 +1,32 @@
 from loguru import logger
 
+from sqlalchemy import func
+
 from sqlalchemy.exc import SQLAlchemyError
 
+from blog import db
+
+from blog.db_utils.counters import COUNTERS_ID
+from blog.db_utils.counters import recount_counters
+from blog.db_utils.single_flight import single_flight
+
 from blog.models import Category
 from blog.models import Comment
+from blog.models import Counter
 from blog.models import Post
 
+from config import Config
 
-def get_statistic():
+
+@single_flight
+def get_statistic(exact: bool = False):
     """Метод получения статистики постов из БД.
 
+    В качестве входного параметра принимает:
+
+    exact:  bool  -  пересчёт статистики по таблицам - опционально
+                     (default=False - значения берутся из счётчиков)
+
     Возвращает словарь:
 
     {
@@ -20,35 +37,156 @@ def get_statistic():
     'total_in_posts_table':  int   -  количество постов + черновиков в БД
     }
 
+    По умолчанию статистика читается из таблицы counters одним
+    запросом по первичному ключу. Счётчики поддерживаются
+    методами blog/db_utils при изменении данных.
+    При exact=True(или отсутствии счётчиков) статистика пересчитывается
+    по таблицам, и счётчики исправляются на пересчитанные значения.
+
     В случае ошибки при обращении к БД происходит
     raise Exception с сообщением, соответствующим причине ошибки.
 
     """
 
-    statistic = {'categories_count': None,
-                 'comment_count': None,
-                 'draft_count': None,
-                 'post_count': None,
-                 'total_in_posts_table': None}
-
     try:
-        post_count = Post.query.filter(Post.is_draft == False).count()
-        statistic['post_count'] = post_count
-
-        draft_count = Post.query.filter(Post.is_draft == True).count()
-        statistic['draft_count'] = draft_count
-
-        statistic['total_in_posts_table'] = post_count + draft_count
-
-        categories_count = Category.query.count()
-        statistic['categories_count'] = categories_count
+        counters = None
+        if not exact:
+            counters = Counter.query.get(COUNTERS_ID)
 
-        comment_count = Comment.query.count()
-        statistic['comment_count'] = comment_count
+        if counters is None:
+            statistic = recount_counters()
+        else:
+            statistic = counters.to_dict()
 
     except SQLAlchemyError as e:
+        db.session.rollback()
         logger.warning(f'Не удалось получить статистику. Причина: {str(e)}')
         raise Exception('БД временно недоступна')
 
     return statistic
 
+
+def get_categories_breakdown():
+    """Метод получения статистики в разрезе категорий.
+
+    Возвращает список словарей(по одному на категорию, по возрастанию id):
+    [
+        {
+        'tag':            str,  -  тэг категории
+        'post_count':     int,  -  количество постов категории
+        'draft_count':    int,  -  количество черновиков категории
+        'comment_count':  int   -  количество комментариев к постам категории
+        },
+        ... ,
+        {}
+    ]
+
+    Статистика всех категорий вычисляется одним запросом
+    с группировкой(комментарии предварительно агрегируются по постам).
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    comments_per_post = db.session.query(Comment.post_id,
+                                         func.count(Comment.id).label('comment_count')) \
+                                  .group_by(Comment.post_id) \
+                                  .subquery()
+
+    rows = db.session.query(Category.tag,
+                            func.count(Post.id).filter(Post.is_draft == False),
+                            func.count(Post.id).filter(Post.is_draft == True),
+                            func.coalesce(func.sum(comments_per_post.c.comment_count), 0)) \
+                     .outerjoin(Post, Post.category_id == Category.id) \
+                     .outerjoin(comments_per_post, comments_per_post.c.post_id == Post.id) \
+                     .group_by(Category.id, Category.tag) \
+                     .order_by(Category.id) \
+                     .all()
+
+    return [{'tag': tag,
+             'post_count': post_count,
+             'draft_count': draft_count,
+             'comment_count': int(comment_count)}
+            for tag, post_count, draft_count, comment_count in rows]
+
+
+def get_users_breakdown(top: int):
+    """Метод получения пользователей с наибольшим количеством постов.
+
+    В качестве входного параметра принимает:
+
+    top:  int  -  количество пользователей в результате
+
+    Возвращает список словарей(по убыванию количества постов):
+    [
+        {
+        'user_id':      int,  -  id пользователя
+        'post_count':   int,  -  количество постов пользователя
+        'draft_count':  int   -  количество черновиков пользователя
+        },
+        ... ,
+        {}
+    ]
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    post_count = func.count(Post.id).filter(Post.is_draft == False)
+
+    rows = db.session.query(Post.user_id,
+                            post_count,
+                            func.count(Post.id).filter(Post.is_draft == True)) \
+                     .group_by(Post.user_id) \
+                     .order_by(post_count.desc(), Post.user_id) \
+                     .limit(top) \
+                     .all()
+
+    return [{'user_id': user_id,
+             'post_count': posts,
+             'draft_count': drafts}
+            for user_id, posts, drafts in rows]
+
+
+@single_flight
+def get_statistic_breakdown(categories: bool = False, users: bool = False, top: int = None):
+    """Метод получения детализированной статистики.
+
+    В качестве входных параметров принимает:
+
+    categories:  bool  -  статистика в разрезе категорий - опционально(default=False)
+    users:       bool  -  пользователи с наибольшим количеством постов -
+                          опционально(default=False)
+    top:         int   -  количество пользователей - опционально
+                          (default=None - Config.STATISTIC_TOP_USERS_DEFAULT)
+
+    Возвращает словарь, содержащий только запрошенные разделы:
+
+    {
+    'categories':  list,  -  см. get_categories_breakdown
+    'users':       list   -  см. get_users_breakdown
+    }
+
+    В случае ошибки при обращении к БД происходит
+    raise Exception с сообщением, соответствующим причине ошибки.
+
+    """
+
+    if top is None:
+        top = Config.STATISTIC_TOP_USERS_DEFAULT
+
+    breakdown = {}
+
+    try:
+        if categories:
+            breakdown['categories'] = get_categories_breakdown()
+        if users:
+            breakdown['users'] = get_users_breakdown(top)
+
+    except SQLAlchemyError as e:
+        logger.warning(f'Не удалось получить детализированную статистику. Причина: {str(e)}')
+        raise Exception('БД временно недоступна')
+
+    return breakdown
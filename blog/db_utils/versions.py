@@ -0,0 +1,154 @@
+import threading
+
+from loguru import logger
+
+from sqlalchemy import event
+
+from sqlalchemy.dialects.postgresql import insert
+
+from blog import db
+
+from blog.db_utils.notifications import get_process_id
+from blog.db_utils.notifications import is_listening
+from blog.db_utils.notifications import notify
+from blog.db_utils.notifications import subscribe
+
+from blog.models import TableVersion
+
+
+TABLES_CHANNEL = 'tables_changed'
+
+_callbacks = []
+_lock = threading.Lock()
+_subscribed = False
+
+
+def bump_versions(*tables: str):
+    """Вспомогательный метод увеличения версий данных таблиц.
+
+    В качестве входных параметров принимает имена таблиц,
+    данные которых изменены('posts', 'comments', 'categories').
+
+    Выполняет один INSERT ... ON CONFLICT DO UPDATE без commit -
+    метод вызывается перед commit изменяющего данные метода,
+    поэтому версии изменяются в той же транзакции, что и данные.
+    Строки версий блокируются в порядке имён таблиц, что исключает
+    взаимную блокировку транзакций.
+
+    После commit об изменении таблиц оповещаются подписчики
+    данного процесса, а остальные процессы - уведомлением
+    PostgreSQL(NOTIFY), отправленным в той же транзакции
+    (см. subscribe_changes).
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    names = sorted(set(tables))
+
+    statement = insert(TableVersion.__table__) \
+        .values([{'name': name, 'version': 1} for name in names])
+
+    db.session.execute(statement.on_conflict_do_update(index_elements=[TableVersion.name],
+                                                       set_={'version': TableVersion.version + 1}))
+
+    notify(TABLES_CHANNEL, f'{get_process_id()}:{",".join(names)}')
+
+    db.session.info.setdefault('changed_tables', set()).update(names)
+
+
+def get_versions(*tables: str):
+    """Метод получения версий данных таблиц.
+
+    В качестве входных параметров принимает имена таблиц.
+
+    Возвращает tuple версий в порядке имён таблиц(для таблицы
+    без строки версии - 0). Выполняется один запрос по первичному
+    ключу таблицы table_versions, данные самих таблиц не читаются.
+
+    Ошибки обращения к БД(SQLAlchemyError) обрабатываются
+    вызывающим методом.
+
+    """
+
+    rows = db.session.query(TableVersion.name, TableVersion.version) \
+                     .filter(TableVersion.name.in_(tables)).all()
+
+    versions = dict(rows)
+
+    return tuple(versions.get(name, 0) for name in tables)
+
+
+def subscribe_changes(callback):
+    """Метод подписки на изменения таблиц.
+
+    В качестве входного параметра принимает:
+
+    callback:  callable  -  функция, которая вызывается с set имён
+                            изменённых таблиц или с None, если
+                            изменения могли быть пропущены(изменено всё)
+
+    Функция вызывается синхронно после commit методов blog/db_utils
+    данного процесса и в потоке уведомлений(см. subscribe в
+    blog/db_utils/notifications.py) - при изменениях в других процессах.
+
+    """
+
+    global _subscribed
+
+    with _lock:
+        _callbacks.append(callback)
+
+        if _subscribed:
+            return
+        _subscribed = True
+
+    subscribe(TABLES_CHANNEL, _on_notification)
+
+
+def is_tracking_changes():
+    """Метод проверки доставки изменений таблиц из других процессов.
+
+    Возвращает True, если уведомления об изменениях в данный момент доставляются.
+
+    """
+
+    return is_listening(TABLES_CHANNEL)
+
+
+def _dispatch(tables):
+    with _lock:
+        callbacks = list(_callbacks)
+
+    for callback in callbacks:
+        try:
+            callback(tables)
+        except Exception as e:
+            logger.warning(f'Ошибка при обработке изменения таблиц {tables}. '
+                           f'Причина: {str(e)}')
+
+
+def _on_notification(payload: str):
+    if payload is None:
+        _dispatch(None)
+        return
+
+    process_id, _, tables = payload.partition(':')
+
+    # Изменения данного процесса обработаны после commit
+    if process_id != get_process_id():
+        _dispatch(set(tables.split(',')))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _after_commit(session):
+    tables = session.info.pop('changed_tables', None)
+
+    if tables:
+        _dispatch(tables)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('changed_tables', None)
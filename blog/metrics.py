@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+
+from flask import g
+from flask import has_app_context
+from flask import request
+
+from flask.json import JSONEncoder
+
+from sqlalchemy import event
+
+from sqlalchemy.engine import Engine
+
+from blog import app
+
+from config import Config
+
+
+class Histogram(object):
+    """Гистограмма в формате Prometheus.
+
+    Значения группируются по меткам(route, method), для каждой
+    комбинации меток хранятся количество значений в интервалах,
+    их сумма и общее количество.
+
+    """
+
+    def __init__(self, name: str, description: str, buckets: tuple):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * (len(self.buckets) + 1),
+                                                 'sum': 0.0}
+
+            series['counts'][index] += 1
+            series['sum'] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} histogram']
+
+        with self._lock:
+            series = {labels: {'counts': list(values['counts']), 'sum': values['sum']}
+                      for labels, values in self._series.items()}
+
+        for (route, method), values in sorted(series.items()):
+            labels = f'route="{route}",method="{method}"'
+
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values['counts']):
+                total += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {total}')
+
+            lines.append(f'{self.name}_sum{{{labels}}} {values["sum"]}')
+            lines.append(f'{self.name}_count{{{labels}}} {total}')
+
+        return lines
+
+
+REQUEST_DURATION = Histogram('blog_request_duration_seconds',
+                             'Время обработки запроса',
+                             Config.METRICS_TIME_BUCKETS)
+SQL_STATEMENTS = Histogram('blog_request_sql_statements',
+                           'Количество SQL запросов за запрос к API',
+                           Config.METRICS_SQL_STATEMENTS_BUCKETS)
+SQL_DURATION = Histogram('blog_request_sql_seconds',
+                         'Суммарное время SQL запросов за запрос к API',
+                         Config.METRICS_TIME_BUCKETS)
+SERIALIZATION_DURATION = Histogram('blog_request_serialization_seconds',
+                                   'Суммарное время кодирования JSON за запрос к API',
+                                   Config.METRICS_TIME_BUCKETS)
+RESPONSE_SIZE = Histogram('blog_response_size_bytes',
+                          'Размер ответа(кроме потоковых ответов)',
+                          Config.METRICS_SIZE_BUCKETS)
+
+HISTOGRAMS = (REQUEST_DURATION, SQL_STATEMENTS, SQL_DURATION,
+              SERIALIZATION_DURATION, RESPONSE_SIZE)
+
+
+def render_metrics():
+    """Метод получения метрик процесса в текстовом формате Prometheus."""
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    return '\n'.join(lines) + '\n'
+
+
+def record_serialization(seconds: float):
+    """Метод учёта времени кодирования JSON в метриках текущего запроса.
+
+    Вызывается кодировщиками ответов. Вне запроса(или при
+    отключенных метриках) ничего не делает.
+
+    """
+
+    if has_app_context():
+        metrics = g.get('_metrics')
+        if metrics is not None:
+            metrics['serialization'] += seconds
+
+
+class TimedJSONEncoder(JSONEncoder):
+    """JSONEncoder приложения, учитывающий время кодирования(jsonify, json.dumps)."""
+
+    def encode(self, o):
+        started = time.perf_counter()
+        try:
+            return super().encode(o)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['_metrics_started'].pop()
+
+    if has_app_context():
+        metrics = g.get('_metrics')
+        if metrics is not None:
+            metrics['sql_statements'] += 1
+            metrics['sql'] += elapsed
+
+
+def _handle_error(context):
+    # Запрос завершился ошибкой - after_cursor_execute не будет вызван
+    started = context.connection.info.get('_metrics_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+def _before_request():
+    g._metrics = {'started': time.perf_counter(),
+                  'sql_statements': 0,
+                  'sql': 0.0,
+                  'serialization': 0.0}
+
+
+def _after_request(response):
+    metrics = g.pop('_metrics', None)
+    if metrics is None:
+        return response
+
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    labels = (rule, request.method)
+
+    REQUEST_DURATION.observe(labels, time.perf_counter() - metrics['started'])
+    SQL_STATEMENTS.observe(labels, metrics['sql_statements'])
+    SQL_DURATION.observe(labels, metrics['sql'])
+    SERIALIZATION_DURATION.observe(labels, metrics['serialization'])
+
+    if not response.is_streamed:
+        RESPONSE_SIZE.observe(labels, response.calculate_content_length() or 0)
+
+    return response
+
+
+if Config.METRICS_ENABLED:
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+
+    app.json_encoder = TimedJSONEncoder
+    app.before_request(_before_request)
+    app.after_request(_after_request)
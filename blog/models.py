@@ -8,31 +8,62 @@ class Post(db.Model):
     __tablename__ = 'posts'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
     title = db.Column(db.String(Config.POST_TITLE_MAX_LENGTH), nullable=False)
     body = db.Column(db.String(Config.POST_BODY_MAX_LENGTH), nullable=False)
     is_draft = db.Column(db.Boolean, nullable=False)
-    tag = db.Column(db.String(Config.TAG_MAX_LENGTH), nullable=True)
+    category_id = db.Column(db.Integer,
+                            db.ForeignKey('categories.id', ondelete='SET NULL'),
+                            nullable=True,
+                            index=True)
+
+    # Номер последнего изменения строки и id изменившей её транзакции
+    # (лента изменений, см. blog/db_utils/changes.py).
+    # Присваиваются в БД при добавлении и изменении строки.
+    change_seq = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text("nextval('change_seq')"))
+    change_xid = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text('txid_current()'))
+
+    # Тэг поста не хранится в таблице posts, а получается
+    # из категории(LEFT OUTER JOIN в том же запросе).
+    category = db.relationship('Category', lazy='joined')
+
+    # Поля, доступные в to_dict
+    FIELDS = ('id', 'user_id', 'title', 'body', 'tag')
+
+    __table_args__ = (
+        # Частичный индекс опубликованных постов(пагинация и подсчёт)
+        db.Index('ix_posts_published_id', 'id', postgresql_where=(is_draft == False)),
+        db.Index('ix_posts_change_xid', 'change_xid', 'change_seq'),
+    )
 
     def __init__(self,
                  user_id: int,
                  title: str,
                  body: str,
                  is_draft: bool = False,
-                 tag: str = None):
+                 category_id: int = None):
 
         self.user_id = user_id
         self.title = title
         self.body = body
         self.is_draft = is_draft
-        self.tag = tag
+        self.category_id = category_id
 
-    def to_dict(self):
-        post = {'id': self.id,
-                'user_id': self.user_id,
-                'title': self.title,
-                'body': self.body,
-                'tag': self.tag}
+    @property
+    def tag(self):
+        if self.category is None:
+            return None
+
+        return self.category.tag
+
+    def to_dict(self, fields: tuple = None):
+        # При наличии fields в словарь попадают только перечисленные поля,
+        # остальные атрибуты не запрашиваются(могут быть не загружены из БД).
+        post = {field: getattr(self, field) for field in fields or self.FIELDS}
 
         return post
 
@@ -42,10 +73,24 @@ class Comment(db.Model):
     __tablename__ = 'comments'
 
     id = db.Column(db.Integer, primary_key=True)
-    post_id = db.Column(db.Integer, nullable=False)
-    email = db.Column(db.String(100), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    email = db.Column(db.String(Config.COMMENT_EMAIL_MAX_LENGTH), nullable=False)
     name = db.Column(db.String(Config.COMMENT_TITLE_MAX_LENGTH), nullable=False)
     body = db.Column(db.Text, nullable=False)
+    change_seq = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text("nextval('change_seq')"))
+    change_xid = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text('txid_current()'))
+
+    FIELDS = ('id', 'post_id', 'email', 'name', 'body')
+
+    __table_args__ = (
+        # Выборка комментариев поста с сортировкой по id
+        db.Index('ix_comments_post_id', 'post_id', 'id'),
+        db.Index('ix_comments_change_xid', 'change_xid', 'change_seq'),
+    )
 
     def __init__(self,
                  post_id: int,
@@ -58,12 +103,8 @@ class Comment(db.Model):
         self.name = name
         self.body = body
 
-    def to_dict(self):
-        comment = {'id': self.id,
-                   'post_id': self.post_id,
-                   'email': self.email,
-                   'name': self.name,
-                   'body': self.body}
+    def to_dict(self, fields: tuple = None):
+        comment = {field: getattr(self, field) for field in fields or self.FIELDS}
 
         return comment
 
@@ -76,6 +117,21 @@ class Category(db.Model):
     name = db.Column(db.String(Config.CATEGORY_NAME_MAX_LENGTH), nullable=False, unique=True)
     tag = db.Column(db.String(Config.TAG_MAX_LENGTH), nullable=False, unique=True)
 
+    # Смена тэга не изменяет строки постов: клиенты ленты изменений
+    # получают изменённую категорию и сопоставляют её с постами по category_id
+    change_seq = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text("nextval('change_seq')"))
+    change_xid = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text('txid_current()'))
+
+    FIELDS = ('id', 'name', 'tag')
+
+    __table_args__ = (
+        db.Index('ix_categories_change_xid', 'change_xid', 'change_seq'),
+    )
+
     def __init__(self,
                  name: str,
                  tag: str):
@@ -83,10 +139,61 @@ class Category(db.Model):
         self.name = name
         self.tag = tag
 
-    def to_dict(self):
-        category = {'id': self.id,
-                    'name': self.name,
-                    'tag': self.tag}
+    def to_dict(self, fields: tuple = None):
+        category = {field: getattr(self, field) for field in fields or self.FIELDS}
 
         return category
 
+
+class Counter(db.Model):
+
+    __tablename__ = 'counters'
+
+    # Таблица содержит одну строку(id=1) со счётчиками для статистики.
+    # Счётчики изменяются методами blog/db_utils в той же транзакции,
+    # что и данные(см. blog/db_utils/counters.py).
+    id = db.Column(db.Integer, primary_key=True)
+    post_count = db.Column(db.BigInteger, nullable=False, default=0)
+    draft_count = db.Column(db.BigInteger, nullable=False, default=0)
+    categories_count = db.Column(db.BigInteger, nullable=False, default=0)
+    comment_count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        counter = {'categories_count': self.categories_count,
+                   'comment_count': self.comment_count,
+                   'draft_count': self.draft_count,
+                   'post_count': self.post_count,
+                   'total_in_posts_table': self.post_count + self.draft_count}
+
+        return counter
+
+
+class TableVersion(db.Model):
+
+    __tablename__ = 'table_versions'
+
+    # Версия данных таблицы(строка на каждую таблицу). Версия увеличивается
+    # методами blog/db_utils в той же транзакции, что и данные,
+    # и используется для ETag ответов(см. blog/db_utils/versions.py).
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class Tombstone(db.Model):
+
+    __tablename__ = 'tombstones'
+
+    # Запись об удалении строки таблицы posts, comments или categories.
+    # Добавляется триггером БД при удалении(лента изменений, см. blog/db_utils/changes.py).
+    change_seq = db.Column(db.BigInteger,
+                           primary_key=True,
+                           server_default=db.text("nextval('change_seq')"))
+    change_xid = db.Column(db.BigInteger,
+                           nullable=False,
+                           server_default=db.text('txid_current()'))
+    table_name = db.Column(db.String(20), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tombstones_change_xid', 'change_xid', 'change_seq'),
+    )
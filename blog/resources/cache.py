@@ -0,0 +1,338 @@
+import functools
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+
+from flask import request
+from flask import Response
+
+from werkzeug.http import unquote_etag
+
+from loguru import logger
+
+from blog.db_utils.versions import is_tracking_changes
+from blog.db_utils.versions import subscribe_changes
+
+from config import Config
+
+
+class MemoryBackend(object):
+    """Хранилище кэша в памяти процесса(LRU).
+
+    Размер хранилища ограничен max_bytes(учитывается размер тела
+    ответа и ключа), при превышении удаляются давно не
+    использованные записи.
+
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if entry['expires'] < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict):
+        entry = dict(entry, expires=time.monotonic() + entry['ttl'])
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = entry
+            self.size += entry['size']
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tables=None):
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if tables is None or entry['tables'] & tables]
+            for key in keys:
+                self._remove(key)
+
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.size,
+                    'evictions': self.evictions}
+
+    def _remove(self, key: str):
+        self.size -= self._entries.pop(key)['size']
+
+
+class SqliteBackend(object):
+    """Хранилище кэша в файле SQLite, общее для процессов одного сервера.
+
+    Размер хранилища ограничен max_bytes, при превышении удаляются
+    записи с ближайшим окончанием TTL(чтение записи не изменяет файл).
+
+    """
+
+    def __init__(self, max_bytes: int, path: str):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.evictions = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'key TEXT PRIMARY KEY, tables TEXT, expires REAL, '
+                               'size INTEGER, body BLOB, mimetype TEXT, etag TEXT)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_entries_expires ON entries (expires)')
+
+    def get(self, key: str):
+        row = self._connection().execute('SELECT tables, body, mimetype, etag FROM entries '
+                                         'WHERE key = ? AND expires >= ?',
+                                         (key, time.time())).fetchone()
+        if row is None:
+            return None
+
+        return {'tables': set(row[0].strip(',').split(',')),
+                'body': row[1],
+                'mimetype': row[2],
+                'etag': row[3]}
+
+    def set(self, key: str, entry: dict):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (key, f',{",".join(entry["tables"])},',
+                                time.time() + entry['ttl'], entry['size'],
+                                entry['body'], entry['mimetype'], entry['etag']))
+
+            size = connection.execute('SELECT coalesce(sum(size), 0) FROM entries').fetchone()[0]
+
+            while size > self.max_bytes:
+                key, entry_size = connection.execute('SELECT key, size FROM entries '
+                                                     'ORDER BY expires LIMIT 1').fetchone()
+                connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                size -= entry_size
+
+                with self._lock:
+                    self.evictions += 1
+
+    def invalidate(self, tables=None):
+        with self._connection() as connection:
+            if tables is None:
+                return connection.execute('DELETE FROM entries').rowcount
+
+            deleted = 0
+            for table in tables:
+                deleted += connection.execute('DELETE FROM entries WHERE tables LIKE ?',
+                                              (f'%,{table},%',)).rowcount
+            return deleted
+
+    def stats(self):
+        entries, size = self._connection().execute('SELECT count(*), coalesce(sum(size), 0) '
+                                                   'FROM entries').fetchone()
+        return {'entries': entries,
+                'bytes': size,
+                'evictions': self.evictions}
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+
+        return connection
+
+
+class ResponseCache(object):
+    """Кэш ответов GET запросов.
+
+    Ответ кэшируется на время Config.RESPONSE_CACHE_TTL[endpoint]
+    и удаляется из кэша сразу после commit метода blog/db_utils,
+    изменившего одну из таблиц, от которых зависит ответ
+    (см. subscribe_changes в blog/db_utils/versions.py). Изменения
+    в других процессах доставляются уведомлениями PostgreSQL,
+    пока они не доставляются - кэш не используется.
+
+    Хранилище выбирается Config.RESPONSE_CACHE_BACKEND:
+    'memory' - память процесса, 'sqlite' - файл, общий для процессов.
+
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.invalidations = 0
+
+    def cached(self, endpoint: str, tables: tuple):
+        """Декоратор кэширования ответа GET метода ресурса.
+
+        В качестве входных параметров принимает:
+
+        endpoint:  str    -  имя ресурса(ключ Config.RESPONSE_CACHE_TTL)
+        tables:    tuple  -  таблицы, от данных которых зависит ответ
+
+        Кэшируются только успешные(200) ответы, отправляемые целиком.
+
+        """
+
+        def decorator(method):
+
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                ttl = Config.RESPONSE_CACHE_TTL.get(endpoint)
+                if not ttl:
+                    return method(*args, **kwargs)
+
+                backend = self._get_backend()
+
+                if not is_tracking_changes():
+                    self._count('bypasses')
+                    return method(*args, **kwargs)
+
+                key = f'{endpoint}:{request.full_path}:'.encode() + request.get_data()
+                key = key.decode(errors='replace')
+
+                try:
+                    entry = backend.get(key)
+                except Exception as e:
+                    logger.warning(f'Не удалось прочитать кэш ответов. Причина: {str(e)}')
+                    entry = None
+
+                if entry is not None:
+                    self._count('hits')
+                    return self._make_response(entry)
+
+                self._count('misses')
+
+                # Если данные изменятся во время выполнения метода -
+                # ответ может быть устаревшим и не сохраняется
+                generation = self._generation
+                response = method(*args, **kwargs)
+
+                if isinstance(response, Response) and response.status_code == 200 \
+                        and not response.is_streamed and generation == self._generation:
+                    body = response.get_data()
+                    entry = {'tables': set(tables),
+                             'ttl': ttl,
+                             'size': len(body) + len(key),
+                             'body': body,
+                             'mimetype': response.mimetype,
+                             'etag': response.headers.get('ETag')}
+
+                    try:
+                        backend.set(key, entry)
+                    except Exception as e:
+                        logger.warning(f'Не удалось записать кэш ответов. Причина: {str(e)}')
+
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, tables=None):
+        """Метод удаления из кэша ответов, зависящих от таблиц.
+
+        Принимает set имён изменённых таблиц(None - удаляются все ответы).
+
+        """
+
+        with self._lock:
+            self._generation += 1
+
+        backend = self._backend
+        if backend is not None:
+            invalidated = backend.invalidate(tables)
+
+            with self._lock:
+                self.invalidations += invalidated
+
+    def stats(self):
+        """Метод получения счётчиков кэша.
+
+        Возвращает словарь:
+
+        {
+        'backend':        str,
+        'hits':           int  -  ответы из кэша,
+        'misses':         int  -  ответы, отсутствующие в кэше,
+        'bypasses':       int  -  запросы без использования кэша,
+        'invalidations':  int  -  удалённые после изменения данных ответы,
+        'evictions':      int  -  удалённые при превышении размера ответы,
+        'entries':        int  -  ответы в кэше,
+        'bytes':          int  -  размер ответов в кэше
+        }
+
+        """
+
+        with self._lock:
+            result = {'backend': Config.RESPONSE_CACHE_BACKEND,
+                      'hits': self.hits,
+                      'misses': self.misses,
+                      'bypasses': self.bypasses,
+                      'invalidations': self.invalidations,
+                      'evictions': 0,
+                      'entries': 0,
+                      'bytes': 0}
+
+        if self._backend is not None:
+            result.update(self._backend.stats())
+
+        return result
+
+    def _get_backend(self):
+        if self._backend is not None:
+            return self._backend
+
+        with self._lock:
+            if self._backend is None:
+                if Config.RESPONSE_CACHE_BACKEND == 'sqlite':
+                    self._backend = SqliteBackend(Config.RESPONSE_CACHE_MAX_BYTES,
+                                                  Config.RESPONSE_CACHE_SQLITE_PATH)
+                else:
+                    self._backend = MemoryBackend(Config.RESPONSE_CACHE_MAX_BYTES)
+
+                subscribe_changes(self.invalidate)
+
+        return self._backend
+
+    def _count(self, counter: str):
+        # Запросы обрабатываются в нескольких потоках
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _make_response(entry: dict):
+        if entry['etag'] and request.if_none_match.contains_weak(unquote_etag(entry['etag'])[0]):
+            response = Response(status=304)
+        else:
+            response = Response(entry['body'], mimetype=entry['mimetype'])
+
+        if entry['etag']:
+            response.headers['ETag'] = entry['etag']
+
+        return response
+
+
+response_cache = ResponseCache()
@@ -2,7 +2,6 @@ from flask import jsonify
 from flask import Response
 
 from flask_restful import Resource
-from flask_restful import reqparse
 
 from flask_restful_swagger import swagger
 
@@ -10,8 +9,23 @@ from blog.db_utils.categories import add_category
 from blog.db_utils.categories import change_category
 from blog.db_utils.categories import delete_category
 from blog.db_utils.categories import get_all_categories
+from blog.db_utils.categories import get_all_categories_rows
 
+from blog.models import Category
+
+from blog.resources.cache import response_cache
+
+from blog.resources.common import conditional
 from blog.resources.common import make_exception_response
+from blog.resources.common import make_json_response
+from blog.resources.common import make_stream_response
+from blog.resources.common import parse_fields_param
+from blog.resources.common import use_fast_path
+
+from blog.resources.schemas import CATEGORIES_DELETE
+from blog.resources.schemas import CATEGORIES_GET
+from blog.resources.schemas import CATEGORIES_POST
+from blog.resources.schemas import CATEGORIES_PUT
 
 
 class Categories(Resource):
@@ -63,12 +77,9 @@ class Categories(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('name')
-        parser.add_argument('tag')
-        args = parser.parse_args()
-
         try:
+            args = CATEGORIES_POST.parse()
+
             add_category(name=args['name'],
                          tag=args['tag'])
 
@@ -134,13 +145,8 @@ class Categories(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('category_id')
-        parser.add_argument('name')
-        parser.add_argument('tag')
-        args = parser.parse_args()
-
         try:
+            args = CATEGORIES_PUT.parse()
 
             change_category(category_id=args['category_id'],
                             name=args['name'],
@@ -153,13 +159,45 @@ class Categories(Resource):
         return Response(status=201)
 
     @swagger.operation(
+        parameters=[
+            {
+                "name": "stream",
+                "description": "Потоковая отправка ответа(опционально, boolean значение)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            },
+            {
+                "name": "fields",
+                "description": "Поля категории через ','(опционально, "
+                               "при наличии - из БД загружаются только перечисленные поля)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "fast",
+                "description": "Чтение Core запросом и быстрое кодирование ответа"
+                               "(опционально, boolean значение, "
+                               "по умолчанию - Config.FAST_READ_PATH)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            }
+        ],
         responseMessages=[
+            {
+                "code": 304,
+                "message": "Данные не изменились(ETag из заголовка If-None-Match актуален)"
+            },
             {
                 "code": 503,
                 "message": "БД временно недоступна"
             }
         ]
     )
+    @response_cache.cached('categories', tables=('categories',))
+    @conditional('categories')
     def get(self):
         """GET запрос для получения всех существующих категорий.
 
@@ -171,6 +209,22 @@ class Categories(Resource):
         'name':  str  -  название категории
         'tag':   str  -  тэг категории
 
+        С параметром 'stream': true - категории читаются из БД порциями
+        и отправляются клиенту по мере кодирования.
+
+        С параметром 'fields'(например 'id,tag') категории содержат
+        только перечисленные поля, остальные колонки не читаются из БД.
+
+        С параметром 'fast'(по умолчанию - Config.FAST_READ_PATH) категории
+        читаются Core запросом без создания объектов Category, а ответ
+        кодируется orjson(при наличии). Ответ совпадает с обычным.
+
+        Успешный ответ кэшируется на время Config.RESPONSE_CACHE_TTL
+        и удаляется из кэша при изменении данных.
+
+        Ответ содержит заголовок ETag. При совпадении ETag с заголовком
+        If-None-Match возвращается 304 без чтения данных из БД.
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
@@ -183,10 +237,20 @@ class Categories(Resource):
         result = []
 
         try:
-            categories = get_all_categories()
+            args = CATEGORIES_GET.parse()
+            fields = parse_fields_param(args['fields'], Category.FIELDS)
+
+            if args['stream']:
+                return make_stream_response(get_all_categories(stream=True, fields=fields),
+                                            lambda category: category.to_dict(fields))
+
+            if use_fast_path('categories', args['fast']):
+                return make_json_response(get_all_categories_rows(fields=fields))
+
+            categories = get_all_categories(fields=fields)
 
             for category in categories:
-                result.append(category.to_dict())
+                result.append(category.to_dict(fields))
 
         except Exception as e:
             response = make_exception_response(str(e))
@@ -232,11 +296,8 @@ class Categories(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('category_id')
-        args = parser.parse_args()
-
         try:
+            args = CATEGORIES_DELETE.parse()
             delete_category(category_id=args['category_id'])
         except Exception as e:
             response = make_exception_response(str(e))
@@ -2,14 +2,33 @@ from flask import jsonify
 from flask import Response
 
 from flask_restful import Resource
-from flask_restful import reqparse
 
 from flask_restful_swagger import swagger
 
 from blog.db_utils.comments import add_comment
 from blog.db_utils.comments import get_all_comments_for_post
+from blog.db_utils.comments import get_all_comments_for_post_rows
+from blog.db_utils.comments import get_comments_for_posts
 
+from blog.models import Comment
+
+from blog.resources.cache import response_cache
+
+from blog.resources.common import conditional
+from blog.resources.common import decode_cursor
+from blog.resources.common import encode_cursor
 from blog.resources.common import make_exception_response
+from blog.resources.common import make_json_response
+from blog.resources.common import make_stream_response
+from blog.resources.common import parse_fields_param
+from blog.resources.common import parse_int_param
+from blog.resources.common import parse_posts_id_param
+from blog.resources.common import use_fast_path
+
+from blog.resources.schemas import COMMENTS_GET
+from blog.resources.schemas import COMMENTS_POST
+
+from config import Config
 
 
 class Comments(Resource):
@@ -79,15 +98,9 @@ class Comments(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('post_id')
-        parser.add_argument('email')
-        parser.add_argument('name')
-        parser.add_argument('text')
-
-        args = parser.parse_args()
-
         try:
+            args = COMMENTS_POST.parse()
+
             add_comment(post_id=args['post_id'],
                         email=args['email'],
                         name=args['name'],
@@ -107,9 +120,61 @@ class Comments(Resource):
                 "in": "query",
                 "dataType": "integer",
                 "paramType": "query"
+            },
+            {
+                "name": "stream",
+                "description": "Потоковая отправка ответа(опционально, boolean значение)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            },
+            {
+                "name": "post_ids",
+                "description": "Id постов через ','(опционально, вместо post_id - "
+                               "комментарии нескольких постов одним запросом)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "limit",
+                "description": "Количество комментариев каждого поста для post_ids(опционально)",
+                "in": "query",
+                "dataType": "integer",
+                "paramType": "query"
+            },
+            {
+                "name": "cursor",
+                "description": "Курсор следующей страницы комментариев поста из поля next_cursor"
+                               "(опционально, может повторяться для разных постов)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query",
+                "allowMultiple": True
+            },
+            {
+                "name": "fields",
+                "description": "Поля комментария через ','(опционально, "
+                               "при наличии - из БД загружаются только перечисленные поля)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "fast",
+                "description": "Чтение Core запросом и быстрое кодирование ответа"
+                               "(опционально, boolean значение, "
+                               "по умолчанию - Config.FAST_READ_PATH)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
             }
         ],
         responseMessages=[
+            {
+                "code": 304,
+                "message": "Данные не изменились(ETag из заголовка If-None-Match актуален)"
+            },
             {
                 "code": 409,
                 "message": "Не удалось получить комментарии адресованные посту."
@@ -121,13 +186,16 @@ class Comments(Resource):
             }
         ]
     )
+    @response_cache.cached('comments', tables=('comments',))
+    @conditional('comments', 'posts')
     def get(self):
         """GET запрос для получения всех комментариев поста.
 
         Принимает JSON с id поста для которого
         необходимо найти комментарии:
 
-        'post_id':  int  -  id поста для которого необходимо найти комментарии
+        'post_id':  int   -  id поста для которого необходимо найти комментарии
+        'stream':   bool  -  потоковая отправка ответа(опционально)
 
         Возвращает JSON объект содержащий все комментарии из БД,
         которые адресованы посту с id из запроса.
@@ -140,6 +208,33 @@ class Comments(Resource):
         'name':     str  -  имя оставившего комментарий
         'body':     str  -  текст комментария
 
+        Вместо post_id может быть передан параметр 'post_ids' -
+        id нескольких постов через ','(не более Config.COMMENTS_BATCH_MAX_POSTS).
+        Тогда комментарии всех постов получаются одним запросом
+        и возвращается JSON объект, ключи которого - id постов:
+
+        '<post_id>':  {
+                      'comments':     list  -  не более 'limit' комментариев поста
+                      'next_cursor':  str   -  курсор следующей страницы комментариев
+                                               поста(null - если страница последняя)
+                      }
+
+        Для получения следующих страниц курсоры постов передаются
+        в параметре 'cursor'(параметр повторяется для каждого поста).
+
+        С параметром 'fields'(например 'id,name') комментарии содержат
+        только перечисленные поля, остальные колонки не читаются из БД.
+
+        С параметром 'fast'(по умолчанию - Config.FAST_READ_PATH) комментарии
+        одного поста читаются Core запросом без создания объектов Comment,
+        а ответ кодируется orjson(при наличии). Ответ совпадает с обычным.
+
+        Успешный ответ кэшируется на время Config.RESPONSE_CACHE_TTL
+        и удаляется из кэша при изменении данных.
+
+        Ответ содержит заголовок ETag. При совпадении ETag с заголовком
+        If-None-Match возвращается 304 без чтения данных из БД.
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
@@ -150,14 +245,32 @@ class Comments(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('post_id')
-        args = parser.parse_args()
+        try:
+            args = COMMENTS_GET.parse()
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
 
         post_id = args['post_id']
 
+        if args['post_ids'] is not None:
+            return self._get_for_posts(args)
+
         try:
-            comments = get_all_comments_for_post(post_id=post_id)
+            fields = parse_fields_param(args['fields'], Comment.FIELDS)
+
+            if args['stream']:
+                return make_stream_response(get_all_comments_for_post(post_id=post_id,
+                                                                      stream=True,
+                                                                      fields=fields),
+                                            lambda comment: comment.to_dict(fields))
+
+            if use_fast_path('comments', args['fast']):
+                return make_json_response(get_all_comments_for_post_rows(post_id=post_id,
+                                                                         fields=fields))
+
+            comments = get_all_comments_for_post(post_id=post_id,
+                                                 fields=fields)
 
         except Exception as e:
             response = make_exception_response(str(e))
@@ -165,7 +278,56 @@ class Comments(Resource):
 
         result = []
         for comment in comments:
-            result.append(comment.to_dict())
+            result.append(comment.to_dict(fields))
 
         return jsonify(result)
 
+    @staticmethod
+    def _get_for_posts(args):
+        """Получение комментариев нескольких постов(параметр post_ids)."""
+
+        try:
+            fields = parse_fields_param(args['fields'], Comment.FIELDS)
+
+            posts_id = parse_posts_id_param(args['post_ids'], Config.COMMENTS_BATCH_MAX_POSTS)
+
+            limit = parse_int_param(args['limit'], 'limit',
+                                    default=Config.COMMENTS_PAGE_DEFAULT_LIMIT,
+                                    minimum=1,
+                                    maximum=Config.COMMENTS_PAGE_MAX_LIMIT)
+
+            after_ids = {}
+            for cursor in args['cursor'] or []:
+                position = decode_cursor(cursor)
+                cursor_post_id = parse_int_param(position.get('post_id'), 'cursor')
+                after_id = parse_int_param(position.get('after_id'), 'cursor')
+
+                # Курсоры next_cursor всегда содержат оба поля
+                if cursor_post_id is None or after_id is None:
+                    raise Exception('Проверьте корректность параметра cursor.')
+
+                after_ids[cursor_post_id] = after_id
+
+            # Запрашивается на один комментарий больше, чем необходимо,
+            # что бы без дополнительного запроса узнать о наличии следующей страницы.
+            comments = get_comments_for_posts(posts_id=posts_id,
+                                              limit=limit + 1,
+                                              after_ids=after_ids,
+                                              fields=fields)
+
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
+
+        result = {}
+        for post_id, post_comments in comments.items():
+            next_cursor = None
+            if len(post_comments) > limit:
+                post_comments = post_comments[:limit]
+                next_cursor = encode_cursor({'post_id': post_id,
+                                             'after_id': post_comments[-1].id})
+
+            result[str(post_id)] = {'comments': [comment.to_dict(fields) for comment in post_comments],
+                                    'next_cursor': next_cursor}
+
+        return jsonify(result)
@@ -0,0 +1,100 @@
+from flask import Response
+
+from flask_restful import Resource
+
+from flask_restful_swagger import swagger
+
+from blog.db_utils.comment_hub import comment_hub
+
+from blog.resources.common import make_exception_response
+from blog.resources.common import parse_posts_id_param
+
+from blog.resources.schemas import COMMENTS_STREAM_GET
+
+from config import Config
+
+
+class CommentsStream(Resource):
+    """Класс для получения новых комментариев в реальном времени."""
+
+    @swagger.operation(
+        parameters=[
+            {
+                "name": "post_ids",
+                "description": "Id постов через ',', новые комментарии которых необходимо получать",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            }
+        ],
+        responseMessages=[
+            {
+                "code": 409,
+                "message": "Проверьте корректность параметра post_ids."
+            }
+        ]
+    )
+    def get(self):
+        """GET запрос для получения новых комментариев постов(Server-Sent Events).
+
+        Принимает параметр 'post_ids' - id постов через ','
+        (не более Config.COMMENTS_STREAM_MAX_POSTS).
+
+        Возвращает поток text/event-stream, который не завершается,
+        пока клиент не закроет соединение. События потока:
+
+        'comment'  -  новый комментарий одного из постов, поле data содержит
+                      JSON комментария(см. метод `to_dict` класса `Comment`
+                      в blog/models.py)
+        'reset'    -  комментарии могли быть пропущены(переподключение к БД
+                      или клиент не успевает читать события), клиенту необходимо
+                      получить комментарии запросом GET /api/v1/comments
+                      (после 'reset' из-за переполнения поток завершается)
+
+        Каждые Config.COMMENTS_STREAM_KEEPALIVE секунд без событий
+        отправляется комментарий SSE(строка ': keepalive'),
+        что бы обнаружить закрытое клиентом соединение.
+
+        Поток не занимает соединение с БД: все потоки процесса получают
+        комментарии через одно соединение LISTEN(см. CommentHub
+        в blog/db_utils/comment_hub.py).
+
+        В случае ошибки возвращает сообщение соответствующее
+        типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
+        и соответствующий код.
+
+        Возможные коды ошибок:
+        При не корректном параметре post_ids - 409
+
+        """
+
+        try:
+            args = COMMENTS_STREAM_GET.parse()
+            posts_id = parse_posts_id_param(args['post_ids'], Config.COMMENTS_STREAM_MAX_POSTS)
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
+
+        subscription = comment_hub.subscribe(set(posts_id))
+
+        def generate():
+            yield ': connected\n\n'
+
+            while not subscription.closed:
+                event = subscription.get(timeout=Config.COMMENTS_STREAM_KEEPALIVE)
+
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+
+                kind, data = event
+                yield f'event: {kind}\ndata: {data or ""}\n\n'
+
+            yield 'event: reset\ndata: \n\n'
+
+        response = Response(generate(), mimetype='text/event-stream')
+        # Подписка освобождается при закрытии соединения сервером
+        response.call_on_close(lambda: comment_hub.unsubscribe(subscription))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
@@ -1,4 +1,34 @@
+import base64
+import functools
+import hashlib
+import re
+import time
+
+from flask import current_app
+from flask import json
 from flask import jsonify
+from flask import request
+from flask import Response
+from flask import stream_with_context
+
+from loguru import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from blog import db
+
+from blog.metrics import record_serialization
+
+from blog.db_utils.versions import get_versions
+
+from config import Config
+
+
+# Символы, которые json.dumps(ensure_ascii=True) экранирует, а orjson - нет
+NON_ASCII = re.compile('[^\x00-\x7e]')
 
 
 def make_exception_response(exception_massage: str):
@@ -26,3 +56,315 @@ def make_exception_response(exception_massage: str):
 
     return response
 
+
+def parse_int_param(value, name: str, default: int = None, minimum: int = 0, maximum: int = None):
+    """Вспомогательный метод разбора целочисленного параметра запроса.
+
+    В качестве входных параметров принимает:
+
+    value:    str  -  значение параметра из запроса
+    name:     str  -  имя параметра(используется в сообщении ошибки)
+    default:  int  -  значение при отсутствии параметра в запросе
+    minimum:  int  -  минимально допустимое значение(default=0)
+    maximum:  int  -  максимально допустимое значение(опционально)
+
+    Возвращает int. Значения больше maximum заменяются на maximum.
+
+    При не корректном значении происходит raise Exception
+    с сообщением об ошибке.
+
+    """
+
+    if value is None or value == '':
+        return default
+
+    try:
+        result = int(value)
+    except (TypeError, ValueError):
+        raise Exception(f'Проверьте корректность параметра {name}.')
+
+    if result < minimum:
+        raise Exception(f'Проверьте корректность параметра {name}.')
+
+    if maximum is not None and result > maximum:
+        result = maximum
+
+    return result
+
+
+def parse_posts_id_param(value: str, maximum: int):
+    """Вспомогательный метод разбора параметра post_ids.
+
+    В качестве входных параметров принимает:
+
+    value:    str  -  значение параметра из запроса(id постов через ',')
+    maximum:  int  -  максимальное количество постов
+
+    Возвращает list id постов без повторов(в порядке запроса).
+
+    При не корректном значении происходит raise Exception
+    с сообщением об ошибке.
+
+    """
+
+    posts_id = []
+    for item in value.replace(' ', '').split(','):
+        post_id = parse_int_param(item, 'post_ids', minimum=1)
+        if post_id is None:
+            raise Exception('Проверьте корректность параметра post_ids.')
+        if post_id not in posts_id:
+            posts_id.append(post_id)
+
+    if len(posts_id) > maximum:
+        raise Exception('Проверьте корректность параметра post_ids. '
+                        f'Максимальное количество постов - {maximum}.')
+
+    return posts_id
+
+
+def parse_fields_param(value: str, allowed: tuple):
+    """Вспомогательный метод разбора параметра fields.
+
+    В качестве входных параметров принимает:
+
+    value:    str    -  значение параметра из запроса(поля через ',')
+    allowed:  tuple  -  допустимые поля(например Post.FIELDS)
+
+    Возвращает tuple запрошенных полей или None при отсутствии параметра.
+
+    При не корректном значении происходит raise Exception
+    с сообщением об ошибке.
+
+    """
+
+    if not value:
+        return None
+
+    fields = tuple(dict.fromkeys(value.replace(' ', '').split(',')))
+
+    if not set(fields) <= set(allowed):
+        raise Exception('Проверьте корректность параметра fields. '
+                        f'Допустимые значения: {", ".join(allowed)}.')
+
+    return fields
+
+
+def encode_cursor(position: dict):
+    """Вспомогательный метод создания курсора пагинации.
+
+    Принимает словарь с позицией последнего отданного элемента
+    (например {'after_id': 42}).
+
+    Возвращает непрозрачную для клиента строку(url-safe base64).
+
+    """
+
+    raw = json.dumps(position, separators=(',', ':'), sort_keys=True)
+
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Вспомогательный метод разбора курсора пагинации.
+
+    Принимает строку, созданную методом encode_cursor.
+    Возвращает словарь с позицией.
+
+    При не корректном курсоре происходит raise Exception
+    с сообщением об ошибке.
+
+    """
+
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise Exception('Проверьте корректность параметра cursor.')
+
+    if not isinstance(position, dict):
+        raise Exception('Проверьте корректность параметра cursor.')
+
+    return position
+
+
+def make_stream_response(items, convert):
+    """Вспомогательный метод создания потокового response.
+
+    В качестве входных параметров принимает:
+
+    items:    iterable  -  объекты для отправки(например генератор из db_utils)
+    convert:  callable  -  функция преобразования объекта в dict(например to_dict)
+
+    Возвращает response, содержащий JSON массив, который
+    кодируется и отправляется клиенту по одному элементу,
+    не собирая весь список в памяти.
+
+    Первый элемент запрашивается до начала отправки, поэтому
+    ошибка обращения к БД приводит к raise Exception
+    и может быть обработана как обычно(make_exception_response).
+    Ошибка в процессе отправки приводит к обрыву ответа.
+
+    """
+
+    iterator = iter(items)
+
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return Response('[]\n', mimetype='application/json')
+
+    def generate():
+        yield '[' + json.dumps(convert(first), separators=(',', ':'))
+
+        try:
+            for item in iterator:
+                yield ',' + json.dumps(convert(item), separators=(',', ':'))
+
+        except Exception as e:
+            logger.warning(f'Потоковая отправка ответа прервана. Причина: {str(e)}')
+            return
+
+        yield ']\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def use_fast_path(endpoint: str, value: bool = None):
+    """Вспомогательный метод выбора пути чтения.
+
+    В качестве входных параметров принимает:
+
+    endpoint:  str   -  имя ресурса(ключ Config.FAST_READ_PATH)
+    value:     bool  -  значение параметра fast из запроса
+                        (None - используется значение из Config)
+
+    Возвращает True, если ответ необходимо собрать из строк
+    Core запроса и закодировать методом make_json_response.
+
+    """
+
+    if value is None:
+        return Config.FAST_READ_PATH.get(endpoint, False)
+
+    return value
+
+
+def escape_non_ascii(match):
+    """Экранирование символа так же, как json.dumps(ensure_ascii=True)."""
+
+    code = ord(match.group(0))
+
+    if code < 0x10000:
+        return '\\u{0:04x}'.format(code)
+
+    code -= 0x10000
+    return '\\u{0:04x}\\u{1:04x}'.format(0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+def make_json_response(data):
+    """Вспомогательный метод создания JSON response быстрым кодировщиком.
+
+    Принимает данные из словарей, списков, строк, чисел, bool и None.
+
+    Возвращает response, байт в байт совпадающий с jsonify(data):
+    ключи сортируются(JSON_SORT_KEYS), не ASCII символы
+    экранируются(JSON_AS_ASCII), в конце добавляется перевод строки.
+
+    При наличии пакета orjson данные кодируются им, иначе -
+    стандартным json. В режиме форматированного вывода
+    (debug/JSONIFY_PRETTYPRINT_REGULAR) используется jsonify.
+
+    """
+
+    config = current_app.config
+
+    if orjson is None or config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug:
+        return jsonify(data)
+
+    started = time.perf_counter()
+
+    try:
+        body = orjson.dumps(data, option=orjson.OPT_SORT_KEYS if config['JSON_SORT_KEYS'] else 0)
+    except TypeError:
+        # Например, строки с непарными суррогатами
+        return jsonify(data)
+
+    if config['JSON_AS_ASCII']:
+        body = NON_ASCII.sub(escape_non_ascii, body.decode()).encode()
+
+    record_serialization(time.perf_counter() - started)
+
+    return Response(body + b'\n', mimetype=config['JSONIFY_MIMETYPE'])
+
+
+def has_param(name: str):
+    """Проверка наличия параметра в JSON теле или query string/форме текущего запроса."""
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict) and payload.get(name) is not None:
+        return True
+
+    return request.values.get(name) is not None
+
+
+def conditional(*tables: str, param_tables: dict = None, exempt_params: tuple = None):
+    """Декоратор условного GET запроса(ETag/If-None-Match).
+
+    В качестве входных параметров принимает:
+
+    *tables:       str   -  таблицы, от данных которых зависит ответ
+    param_tables:  dict  -  дополнительные таблицы, от которых ответ
+                            зависит при наличии параметра запроса
+                            (например {'include': ('comments',)}) - опционально
+    exempt_params: tuple -  параметры запроса, при наличии которых ответ
+                            зависит не только от версий таблиц и ETag
+                            не используется - опционально
+
+    ETag вычисляется по версиям таблиц(см. blog/db_utils/versions.py)
+    и параметрам запроса. Если ETag совпадает с заголовком
+    If-None-Match - возвращается 304 без выполнения метода,
+    т.е. без чтения данных из БД. Иначе ETag добавляется
+    к успешному(200) ответу метода.
+
+    Версии читаются до данных, поэтому при записи между
+    этими запросами к новым данным будет добавлен старый ETag -
+    клиент получит данные повторно при следующем запросе.
+
+    """
+
+    def decorator(method):
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if any(has_param(param) for param in exempt_params or ()):
+                return method(*args, **kwargs)
+
+            names = list(tables)
+            for param, extra in (param_tables or {}).items():
+                if has_param(param):
+                    names.extend(extra)
+
+            try:
+                versions = get_versions(*names)
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f'Не удалось получить версии таблиц {names}. Причина: {str(e)}')
+                return method(*args, **kwargs)
+
+            key = f'{names}:{versions}:{request.full_path}:'.encode() + request.get_data()
+            etag = hashlib.sha1(key).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = method(*args, **kwargs)
+
+            if isinstance(response, Response) and response.status_code == 200:
+                response.set_etag(etag)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,36 @@
+from flask import Response
+
+from flask_restful import Resource
+
+from flask_restful_swagger import swagger
+
+from blog.metrics import render_metrics
+
+
+class Metrics(Resource):
+    """Класс для получения метрик запросов в формате Prometheus."""
+
+    @swagger.operation(
+        responseMessages=[]
+    )
+    def get(self):
+        """GET запрос для получения метрик запросов процесса.
+
+        Возвращает текст в формате Prometheus(text/plain; version=0.0.4),
+        содержащий гистограммы по каждому маршруту и методу(метки route, method):
+
+        'blog_request_duration_seconds'       -  время обработки запроса
+        'blog_request_sql_statements'         -  количество SQL запросов
+        'blog_request_sql_seconds'            -  суммарное время SQL запросов
+        'blog_request_serialization_seconds'  -  суммарное время кодирования JSON
+        'blog_response_size_bytes'            -  размер ответа
+
+        Для потоковых ответов учитывается только подготовка ответа(до начала
+        отправки), размер таких ответов не учитывается.
+
+        Метрики относятся к процессу, обработавшему запрос.
+        Сбор метрик отключается Config.METRICS_ENABLED.
+
+        """
+
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,30 +1,208 @@
 from flask import jsonify
+from flask import request
 from flask import Response
 
 from flask_restful import Resource
-from flask_restful import reqparse
 
 from flask_restful_swagger import swagger
 
+from blog.db_utils.changes import get_changes
+
+from blog.db_utils.comments import get_comments_count_for_posts
+from blog.db_utils.comments import get_comments_for_posts
+
 from blog.db_utils.posts import add_post
+from blog.db_utils.posts import add_posts
 from blog.db_utils.posts import change_post_tag
 from blog.db_utils.posts import delete_posts
 from blog.db_utils.posts import get_all_posts
+from blog.db_utils.posts import get_all_posts_rows
+
+from blog.models import Post
 
+from blog.resources.common import conditional
+from blog.resources.common import decode_cursor
+from blog.resources.common import encode_cursor
 from blog.resources.common import make_exception_response
+from blog.resources.common import make_json_response
+from blog.resources.common import make_stream_response
+from blog.resources.common import parse_fields_param
+from blog.resources.common import parse_int_param
+from blog.resources.common import use_fast_path
+
+from blog.resources.schemas import POST_REQUIRED_MESSAGE
+from blog.resources.schemas import POSTS_DELETE
+from blog.resources.schemas import POSTS_GET
+from blog.resources.schemas import POSTS_POST
+from blog.resources.schemas import POSTS_PUT
+
+from config import Config
+
+
+def parse_include_param(value: str):
+    """Вспомогательный метод разбора параметра include.
+
+    Принимает строку вида 'comment_count,comments:5'.
+
+    Возвращает словарь с запрошенными дополнительными полями:
+
+    {
+    'comment_count':  True,
+    'comments':       int  -  количество комментариев каждого поста
+    }
+
+    При не корректном значении происходит raise Exception
+    с сообщением об ошибке.
+
+    """
+
+    include = {}
+
+    if not value:
+        return include
+
+    for item in value.replace(' ', '').split(','):
+        name, _, count = item.partition(':')
+
+        if name == 'comment_count' and not count:
+            include['comment_count'] = True
+
+        elif name == 'comments':
+            include['comments'] = parse_int_param(count, 'include',
+                                                  default=Config.POSTS_INCLUDE_COMMENTS_DEFAULT,
+                                                  minimum=1,
+                                                  maximum=Config.COMMENTS_PAGE_MAX_LIMIT)
+
+        else:
+            raise Exception('Проверьте корректность параметра include. '
+                            'Допустимые значения: comment_count, comments[:N].')
+
+    return include
+
+
+def posts_to_dicts(posts: list, include: dict, fields: tuple = None):
+    """Вспомогательный метод преобразования постов в список словарей.
+
+    В качестве входных параметров принимает:
+
+    posts:    list  -  список объектов Post
+    include:  dict  -  дополнительные поля(см. parse_include_param)
+    fields:   tuple -  поля поста(см. Post.to_dict)
+
+    Дополнительные поля всех постов получаются одним запросом на каждое поле.
+
+    """
+
+    result = [post.to_dict(fields) for post in posts]
+
+    if not include or not posts:
+        return result
+
+    posts_id = [post.id for post in posts]
+
+    if 'comment_count' in include:
+        counts = get_comments_count_for_posts(posts_id)
+        for post_id, post in zip(posts_id, result):
+            post['comment_count'] = counts[post_id]
+
+    if 'comments' in include:
+        comments = get_comments_for_posts(posts_id=posts_id,
+                                          limit=include['comments'])
+        for post_id, post in zip(posts_id, result):
+            post['comments'] = [comment.to_dict() for comment in comments[post_id]]
+
+    return result
 
 
 class Posts(Resource):
     """Класс для работы с постами."""
 
     @swagger.operation(
+        parameters=[
+            {
+                "name": "limit",
+                "description": "Количество постов на странице(опционально, "
+                               "при наличии - ответ отдаётся постранично)",
+                "in": "query",
+                "dataType": "integer",
+                "paramType": "query"
+            },
+            {
+                "name": "after_id",
+                "description": "Id поста, после которого начинается страница(опционально)",
+                "in": "query",
+                "dataType": "integer",
+                "paramType": "query"
+            },
+            {
+                "name": "cursor",
+                "description": "Курсор следующей страницы из поля next_cursor(опционально)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "since",
+                "description": "Значение поля watermark предыдущего ответа или 0(опционально, "
+                               "при наличии - возвращаются только изменения после него)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "stream",
+                "description": "Потоковая отправка ответа(опционально, boolean значение)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            },
+            {
+                "name": "include",
+                "description": "Дополнительные поля постов через ','(опционально, "
+                               "только с limit, after_id или cursor): "
+                               "comment_count - количество комментариев, "
+                               "comments[:N] - первые N комментариев",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "fields",
+                "description": "Поля поста через ','(опционально, "
+                               "при наличии - из БД загружаются только перечисленные поля)",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "fast",
+                "description": "Чтение Core запросом и быстрое кодирование ответа"
+                               "(опционально, boolean значение, "
+                               "по умолчанию - Config.FAST_READ_PATH)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            }
+        ],
         responseMessages=[
+            {
+                "code": 304,
+                "message": "Данные не изменились(ETag из заголовка If-None-Match актуален)"
+            },
+            {
+                "code": 409,
+                "message": "Не корректные параметры пагинации или include"
+            },
             {
                 "code": 503,
                 "message": "БД временно недоступна"
             }
         ]
     )
+    # Ответ ленты изменений(since) зависит и от снимка данных(xmin,
+    # см. get_changes), поэтому для него ETag не используется
+    @conditional('posts', 'categories', param_tables={'include': ('comments',)},
+                 exempt_params=('since',))
     def get(self):
         """GET запрос для получения всех постов.
 
@@ -38,26 +216,138 @@ class Posts(Resource):
         'body':     str  -  текст поста
         'tag':      str  -  тэг категории поста
 
+        При наличии в запросе хотя бы одного из параметров
+        постраничного вывода:
+
+        'limit':     int  -  количество постов на странице
+                             (максимум - Config.POSTS_PAGE_MAX_LIMIT)
+        'after_id':  int  -  id поста, после которого начинается страница
+        'cursor':    str  -  значение next_cursor предыдущей страницы
+
+        возвращается JSON объект:
+
+        'posts':        list  -  посты страницы
+        'next_cursor':  str   -  курсор следующей страницы
+                                 (null - если страница последняя)
+
+        Без параметров постраничного вывода и с параметром
+        'stream': true - посты читаются из БД порциями и
+        отправляются клиенту по мере кодирования.
+
+        С параметром 'include'(значения через ',', только вместе с параметрами
+        постраничного вывода) в каждый пост добавляются поля(одним запросом
+        на страницу, а не на каждый пост):
+
+        'comment_count':  int   -  при значении comment_count -
+                                   количество комментариев поста
+        'comments':       list  -  при значении comments или comments:N -
+                                   первые N(по умолчанию -
+                                   Config.POSTS_INCLUDE_COMMENTS_DEFAULT)
+                                   комментариев поста
+
+        С параметром 'fields'(например 'id,title,tag') посты содержат
+        только перечисленные поля, остальные колонки не читаются из БД.
+
+        С параметром 'since'(значение watermark предыдущего ответа,
+        0 - все данные) возвращаются только изменения после него
+        (см. get_changes в blog/db_utils/changes.py), не более 'limit'
+        (по умолчанию - Config.CHANGES_PAGE_DEFAULT_LIMIT):
+
+        'posts':       list  -  добавленные/изменённые посты(с category_id)
+        'comments':    list  -  добавленные/изменённые комментарии
+        'categories':  list  -  добавленные/изменённые категории(смена тэга
+                                не изменяет посты, тэг сопоставляется по category_id)
+        'tombstones':  list  -  удалённые строки('table': posts/comments/categories, 'id')
+        'watermark':   str   -  значение since для следующего запроса(курсор)
+        'has_more':    bool  -  есть ли следующие изменения
+
+        С параметром 'fast'(по умолчанию - Config.FAST_READ_PATH) посты
+        без 'include' читаются Core запросом без создания объектов Post,
+        а ответ кодируется orjson(при наличии). Ответ совпадает с обычным.
+
+        Ответ(кроме ответа с параметром 'since') содержит заголовок ETag.
+        При совпадении ETag с заголовком If-None-Match возвращается 304
+        без чтения данных из БД.
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
 
         Возможные коды ошибок:
+        При не корректных параметрах пагинации или include - 409
         При невозможности подключения к БД - 503
 
         """
 
         try:
-            posts = get_all_posts()
+            args = POSTS_GET.parse()
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
+
+        if args['since'] is not None:
+            return self._get_changes(args)
+
+        is_paginated = any(args[name] is not None for name in ('limit', 'after_id', 'cursor'))
+
+        try:
+            include = parse_include_param(args['include'])
+            fields = parse_fields_param(args['fields'], Post.FIELDS)
+
+            # Дополнительные поля читаются одним запросом по id всех постов
+            # ответа, поэтому поддерживаются только для страницы постов
+            if include and not is_paginated:
+                raise Exception('Параметр include поддерживается только при '
+                                'постраничном выводе(limit, after_id или cursor).')
+
+            if not is_paginated and args['stream']:
+                return make_stream_response(get_all_posts(stream=True, fields=fields),
+                                            lambda post: post.to_dict(fields))
+
+            fast = not include and use_fast_path('posts', args['fast'])
+
+            if not is_paginated:
+                if fast:
+                    return make_json_response(get_all_posts_rows(fields=fields))
+
+                posts = get_all_posts(fields=fields)
+
+            else:
+                limit = parse_int_param(args['limit'], 'limit',
+                                        default=Config.POSTS_PAGE_DEFAULT_LIMIT,
+                                        minimum=1,
+                                        maximum=Config.POSTS_PAGE_MAX_LIMIT)
+
+                after_id = parse_int_param(args['after_id'], 'after_id')
+                if args['cursor']:
+                    after_id = parse_int_param(decode_cursor(args['cursor']).get('after_id'),
+                                               'cursor')
+
+                if fast:
+                    return self._get_page_rows(limit, after_id, fields)
+
+                # Запрашивается на один пост больше, чем необходимо,
+                # что бы без дополнительного запроса узнать о наличии следующей страницы.
+                posts = get_all_posts(limit=limit + 1,
+                                      after_id=after_id,
+                                      fields=fields)
+
+                next_cursor = None
+                if len(posts) > limit:
+                    posts = posts[:limit]
+                    next_cursor = encode_cursor({'after_id': posts[-1].id})
+
+            result = posts_to_dicts(posts, include, fields)
 
         except Exception as e:
             response = make_exception_response(str(e))
             return response
 
-        result = []
-        for post in posts:
-            result.append(post.to_dict())
-        return jsonify(result)
+        if not is_paginated:
+            return jsonify(result)
+
+        return jsonify({'posts': result,
+                        'next_cursor': next_cursor})
 
     @swagger.operation(
         parameters=[
@@ -124,6 +414,20 @@ class Posts(Resource):
         * & ** имеют ограничения максимального количества символов.
         Информация находится в классе Config в config.py.
 
+        Для пакетного создания принимает JSON массив объектов
+        с теми же полями(не более Config.POSTS_BATCH_MAX_SIZE).
+        Все посты проверяются до обращения к БД и добавляются
+        в одной транзакции. Возвращает JSON массив с результатом
+        для каждого поста:
+
+        'index':    int  -  номер поста в запросе
+        'status':   str  -  created/error
+        'id':       int  -  id созданного поста(для created)
+        'message':  str  -  причина ошибки(для error)
+
+        Код ответа: все посты созданы - 201, созданы не все - 207,
+        не создано ни одного - 409.
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
@@ -134,27 +438,17 @@ class Posts(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('user_id')
-        parser.add_argument('title')
-        parser.add_argument('text')
-        parser.add_argument('is_draft')
-        parser.add_argument('tag')
-
-        args = parser.parse_args()
-
-        is_draft = False
-
-        # Проверка входящего значения is_draft(пометка "черновик")
-        # для корректной обработки строк.
-        if args['is_draft'] and args['is_draft'].lower() == 'true':
-            is_draft = True
+        payload = request.get_json(silent=True)
+        if isinstance(payload, list):
+            return self._post_batch(payload)
 
         try:
+            args = POSTS_POST.parse()
+
             add_post(user_id=args['user_id'],
                      title=args['title'],
                      body=args['text'],
-                     is_draft=is_draft,
+                     is_draft=bool(args['is_draft']),
                      tag=args['tag'])
 
         except Exception as e:
@@ -212,13 +506,9 @@ class Posts(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('post_id')
-        parser.add_argument('tag')
-
-        args = parser.parse_args()
-
         try:
+            args = POSTS_PUT.parse()
+
             change_post_tag(post_id=args['post_id'],
                             tag=args['tag'])
 
@@ -257,6 +547,11 @@ class Posts(Resource):
         передать строку с перечислением id постов разделённых с помощью ','
         ('posts_id': '34,45,67,89,2').
 
+        Возвращает JSON объект:
+
+        'deleted':    list  -  id удалённых постов
+        'not_found':  list  -  id постов, которые не найдены в БД
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
@@ -266,21 +561,133 @@ class Posts(Resource):
 
         """
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('posts_id')
-        args = parser.parse_args()
+        try:
+            args = POSTS_DELETE.parse()
+            separated_posts_id = args['posts_id'].replace(' ', '').split(',')
+
+            result = delete_posts(*separated_posts_id)
+
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
+
+        return jsonify(result)
+
+    @staticmethod
+    def _get_changes(args):
+        """Изменения постов, комментариев и категорий после watermark(параметр since)."""
+
+        try:
+            since_xid, since_seq = 0, 0
+            if args['since'] != '0':
+                try:
+                    position = decode_cursor(args['since'])
+                except Exception:
+                    raise Exception('Проверьте корректность параметра since.')
+
+                since_xid = parse_int_param(position.get('change_xid'), 'since', maximum=2 ** 63 - 1)
+                since_seq = parse_int_param(position.get('change_seq'), 'since', maximum=2 ** 63 - 1)
+
+                if since_xid is None or since_seq is None:
+                    raise Exception('Проверьте корректность параметра since.')
+
+            limit = parse_int_param(args['limit'], 'limit',
+                                    default=Config.CHANGES_PAGE_DEFAULT_LIMIT,
+                                    minimum=1,
+                                    maximum=Config.CHANGES_PAGE_MAX_LIMIT)
+
+            changes = get_changes(since_xid=since_xid, since_seq=since_seq, limit=limit)
+
+        except Exception as e:
+            response = make_exception_response(str(e))
+            return response
+
+        # Результат get_changes может быть общим для одновременных
+        # запросов(см. single_flight) и не изменяется
+        return make_json_response(dict(changes, watermark=encode_cursor(changes['watermark'])))
+
+    @staticmethod
+    def _get_page_rows(limit: int, after_id: int, fields: tuple):
+        """Страница постов без создания объектов Post(параметр fast)."""
+
+        # id необходим для курсора следующей страницы
+        row_fields = fields
+        if fields and 'id' not in fields:
+            row_fields = ('id',) + fields
+
+        posts = get_all_posts_rows(limit=limit + 1,
+                                   after_id=after_id,
+                                   fields=row_fields)
+
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor({'after_id': posts[-1]['id']})
+
+        # Результат get_all_posts_rows может быть общим для одновременных
+        # запросов(см. single_flight) и не изменяется
+        if row_fields is not fields:
+            posts = [{field: post[field] for field in fields} for post in posts]
+
+        return make_json_response({'posts': posts,
+                                   'next_cursor': next_cursor})
+
+    @staticmethod
+    def _post_batch(posts: list):
+        """Пакетное создание постов(JSON массив в теле запроса).
+
+        Каждый пост проверяется схемой POSTS_POST, как при создании
+        одного поста. Некорректные посты не передаются в add_posts
+        и возвращаются с сообщением об ошибке.
+
+        """
 
         try:
-            try:
-                separated_posts_id = args['posts_id'].replace(' ', '').split(',')
-            except Exception:
-                raise Exception('Проверьте корректность параметра posts_id')
+            if not posts:
+                raise Exception('Не корректные данные. '
+                                'Список постов пуст, ни один пост не создан.')
+
+            if len(posts) > Config.POSTS_BATCH_MAX_SIZE:
+                raise Exception('Не корректные данные. '
+                                'Максимальное количество постов в запросе - '
+                                f'{Config.POSTS_BATCH_MAX_SIZE}.')
+
+            results = [None] * len(posts)
+            valid_posts = []
+
+            for index, post in enumerate(posts):
+                try:
+                    if not isinstance(post, dict):
+                        raise Exception(POST_REQUIRED_MESSAGE)
+
+                    values = POSTS_POST.parse_object(post)
 
-            delete_posts(*separated_posts_id)
+                except Exception as e:
+                    results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+                    continue
+
+                valid_posts.append((index, {'user_id': values['user_id'],
+                                            'title': values['title'],
+                                            'body': values['text'],
+                                            'is_draft': values['is_draft'] is True,
+                                            'tag': values['tag'] or None}))
+
+            for result in add_posts(valid_posts):
+                results[result['index']] = result
 
         except Exception as e:
             response = make_exception_response(str(e))
             return response
 
-        return Response(status=200)
+        created_count = sum(1 for result in results if result['status'] == 'created')
+
+        response = jsonify(results)
+
+        if created_count == len(results):
+            response.status_code = 201
+        elif created_count:
+            response.status_code = 207
+        else:
+            response.status_code = 409
 
+        return response
@@ -0,0 +1,39 @@
+from flask import jsonify
+
+from flask_restful import Resource
+
+from flask_restful_swagger import swagger
+
+from blog.db_utils.comment_hub import comment_hub
+from blog.db_utils.single_flight import single_flight_stats
+
+from blog.resources.cache import response_cache
+
+
+class Runtime(Resource):
+    """Класс для получения состояния процесса приложения."""
+
+    @swagger.operation(
+        responseMessages=[]
+    )
+    def get(self):
+        """GET запрос для получения счётчиков процесса.
+
+        Возвращает JSON объект:
+
+        'response_cache':  dict  -  счётчики кэша ответов
+                                    (см. метод stats класса ResponseCache
+                                    в blog/resources/cache.py)
+        'single_flight':   dict  -  счётчики объединения одинаковых
+                                    одновременных вызовов методов чтения
+                                    (см. blog/db_utils/single_flight.py)
+        'comments_stream': int   -  количество открытых потоков новых
+                                    комментариев(GET /api/v1/comments/stream)
+
+        Счётчики относятся к процессу, обработавшему запрос.
+
+        """
+
+        return jsonify({'response_cache': response_cache.stats(),
+                        'single_flight': single_flight_stats(),
+                        'comments_stream': comment_hub.subscribers_count()})
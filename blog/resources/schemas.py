@@ -0,0 +1,252 @@
+from flask import request
+
+from config import Config
+
+
+# Диапазон значений колонки типа integer в PostgreSQL
+INTEGER_MIN = -2 ** 31
+INTEGER_MAX = 2 ** 31 - 1
+
+
+class Field(object):
+    """Описание параметра запроса.
+
+    В качестве входных параметров принимает:
+
+    name:        str   -  имя параметра
+    kind:        type  -  тип значения: str, int или bool(default=str)
+    required:    bool  -  обязательный параметр(default=False)
+    max_length:  int   -  максимальное количество символов строки - опционально
+    many:        bool  -  параметр может повторяться, значение - list(default=False)
+    error:       str   -  сообщение при не корректном значении
+    missing:     str   -  сообщение при отсутствии обязательного параметра
+                          (default=None - используется error)
+    too_long:    str   -  сообщение при превышении max_length
+                          (default=None - используется error)
+
+    """
+
+    def __init__(self, name: str, kind: type = str, required: bool = False,
+                 max_length: int = None, many: bool = False, error: str = None,
+                 missing: str = None, too_long: str = None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        self.many = many
+        self.error = error or f'Проверьте корректность параметра {name}.'
+        self.missing = missing or self.error
+        self.too_long = too_long or self.error
+
+    def convert(self, value):
+        """Приведение значения к типу параметра с проверкой ограничений."""
+
+        if self.kind is bool:
+            if isinstance(value, bool):
+                return value
+            return isinstance(value, str) and value.lower() == 'true'
+
+        if self.kind is int:
+            # 1.5 -> int() отбрасывает дробную часть
+            if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+                raise Exception(self.error)
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise Exception(self.error)
+            if not INTEGER_MIN <= value <= INTEGER_MAX:
+                raise Exception(self.error)
+            return value
+
+        if isinstance(value, (dict, list)):
+            raise Exception(self.error)
+
+        value = str(value)
+        if self.max_length is not None and len(value) > self.max_length:
+            raise Exception(self.too_long)
+
+        return value
+
+
+class Schema(object):
+    """Схема параметров запроса.
+
+    Создаётся один раз при импорте модуля ресурса и заменяет
+    reqparse.RequestParser, который строился при каждом запросе.
+    Параметры читаются из JSON тела и из query string/формы
+    (как в reqparse), значения приводятся к типам и проверяются
+    по ограничениям Config до обращения к БД.
+
+    """
+
+    def __init__(self, *fields: Field):
+        self.fields = fields
+
+    def parse(self):
+        """Разбор параметров текущего запроса.
+
+        Возвращает словарь, в котором есть все параметры схемы
+        (отсутствующие в запросе - None).
+
+        При не корректных данных происходит raise Exception
+        с сообщением, соответствующим причине ошибки.
+
+        """
+
+        payload = request.json
+        if not isinstance(payload, dict):
+            payload = {}
+
+        values = request.values
+        result = {}
+
+        for field in self.fields:
+            if field.many:
+                value = payload.get(field.name, values.getlist(field.name) or None)
+            else:
+                value = payload.get(field.name, values.get(field.name))
+
+            result[field.name] = self._convert(field, value)
+
+        return result
+
+    def parse_object(self, payload: dict):
+        """Разбор параметров из словаря(например, элемента JSON массива в теле запроса).
+
+        Возвращает и проверяет значения так же, как parse.
+
+        """
+
+        return {field.name: self._convert(field, payload.get(field.name)) for field in self.fields}
+
+    @staticmethod
+    def _convert(field: Field, value):
+        if value is None:
+            if field.required:
+                raise Exception(field.missing)
+            return None
+
+        if field.many:
+            if not isinstance(value, list):
+                value = [value]
+            return [field.convert(item) for item in value]
+
+        return field.convert(value)
+
+
+POST_REQUIRED_MESSAGE = 'Не корректные данные. ' \
+                        'Проверьте наличие всех обязательных полей в запросе.'
+
+POST_LENGTH_MESSAGE = 'Ошибка при попытке создания поста. ' \
+                      'Проверьте количество символов в заголовке и тексте поста. ' \
+                      'Максимально допустимое значение для заголовка - ' \
+                      f'{Config.POST_TITLE_MAX_LENGTH} символов, ' \
+                      f'для текста - {Config.POST_BODY_MAX_LENGTH} символов.'
+
+POST_TAG_MESSAGE = 'Не удалось заменить тэг поста. ' \
+                   'Проверьте правильность предоставленного id поста ' \
+                   'и существование предоставленного тэга'
+
+COMMENT_MESSAGE = 'Не удалось создать новый комментарий. ' \
+                  'Проверьте корректность данных.'
+
+COMMENT_LENGTH_MESSAGE = 'Не удалось создать новый комментарий. ' \
+                         'Максимально допустимое значение для email - ' \
+                         f'{Config.COMMENT_EMAIL_MAX_LENGTH} символов, ' \
+                         f'для имени - {Config.COMMENT_TITLE_MAX_LENGTH} символов.'
+
+CATEGORY_LENGTH_MESSAGE = 'Не корректные данные. ' \
+                          'Максимально допустимое значение для названия категории - ' \
+                          f'{Config.CATEGORY_NAME_MAX_LENGTH} символов, ' \
+                          f'для тэга - {Config.TAG_MAX_LENGTH} символов.'
+
+
+POSTS_GET = Schema(Field('limit'),
+                   Field('after_id'),
+                   Field('cursor'),
+                   Field('since'),
+                   Field('stream', kind=bool),
+                   Field('include'),
+                   Field('fields'),
+                   Field('fast', kind=bool))
+
+POSTS_POST = Schema(Field('user_id', kind=int, required=True,
+                          error='Проверьте корректность поля user_id.',
+                          missing=POST_REQUIRED_MESSAGE),
+                    Field('title', required=True,
+                          max_length=Config.POST_TITLE_MAX_LENGTH,
+                          error=POST_REQUIRED_MESSAGE,
+                          too_long=POST_LENGTH_MESSAGE),
+                    Field('text', required=True,
+                          max_length=Config.POST_BODY_MAX_LENGTH,
+                          error=POST_REQUIRED_MESSAGE,
+                          too_long=POST_LENGTH_MESSAGE),
+                    Field('is_draft', kind=bool),
+                    Field('tag', max_length=Config.TAG_MAX_LENGTH,
+                          error='Не корректные данные. '
+                                'Категория с данным тэгом не найдена.'))
+
+POSTS_PUT = Schema(Field('post_id', kind=int, required=True,
+                         error='Не удалось заменить тэг поста. '
+                               'Причина: не корректный id поста.',
+                         missing=POST_TAG_MESSAGE),
+                   Field('tag', max_length=Config.TAG_MAX_LENGTH,
+                         error=POST_TAG_MESSAGE))
+
+POSTS_DELETE = Schema(Field('posts_id', required=True,
+                            error='Проверьте корректность параметра posts_id'))
+
+COMMENTS_GET = Schema(Field('post_id'),
+                      Field('stream', kind=bool),
+                      Field('post_ids'),
+                      Field('limit'),
+                      Field('cursor', many=True),
+                      Field('fields'),
+                      Field('fast', kind=bool))
+
+COMMENTS_STREAM_GET = Schema(Field('post_ids', required=True,
+                                    error='Проверьте корректность параметра post_ids.'))
+
+COMMENTS_POST = Schema(Field('post_id', kind=int, required=True,
+                             error='Не удалось создать комментарий. '
+                                   'Причина: не корректный id поста.'),
+                       Field('email', required=True,
+                             max_length=Config.COMMENT_EMAIL_MAX_LENGTH,
+                             error=COMMENT_MESSAGE,
+                             too_long=COMMENT_LENGTH_MESSAGE),
+                       Field('name', required=True,
+                             max_length=Config.COMMENT_TITLE_MAX_LENGTH,
+                             error=COMMENT_MESSAGE,
+                             too_long=COMMENT_LENGTH_MESSAGE),
+                       Field('text', required=True,
+                             error=COMMENT_MESSAGE))
+
+CATEGORIES_GET = Schema(Field('stream', kind=bool),
+                        Field('fields'),
+                        Field('fast', kind=bool))
+
+CATEGORIES_POST = Schema(Field('name', required=True,
+                               max_length=Config.CATEGORY_NAME_MAX_LENGTH,
+                               error=CATEGORY_LENGTH_MESSAGE,
+                               missing='Не корректные данные. '
+                                       'Не все обязательные поля заполнены.'),
+                         Field('tag', required=True,
+                               max_length=Config.TAG_MAX_LENGTH,
+                               error=CATEGORY_LENGTH_MESSAGE,
+                               missing='Не корректные данные. '
+                                       'Не все обязательные поля заполнены.'))
+
+CATEGORIES_PUT = Schema(Field('category_id', kind=int, required=True,
+                              error='Ошибка при попытке редактирования. '
+                                    'Не корректный id категории.'),
+                        Field('name', max_length=Config.CATEGORY_NAME_MAX_LENGTH,
+                              error=CATEGORY_LENGTH_MESSAGE),
+                        Field('tag', max_length=Config.TAG_MAX_LENGTH,
+                              error=CATEGORY_LENGTH_MESSAGE))
+
+CATEGORIES_DELETE = Schema(Field('category_id', kind=int, required=True,
+                                 error='Проверьте корректость id удаляемой категории.'))
+
+STATISTIC_GET = Schema(Field('exact', kind=bool),
+                       Field('breakdown'),
+                       Field('top'))
@@ -5,21 +5,66 @@ from flask_restful import Resource
 from flask_restful_swagger import swagger
 
 from blog.db_utils.statistic import get_statistic
+from blog.db_utils.statistic import get_statistic_breakdown
 
+from blog.resources.common import conditional
 from blog.resources.common import make_exception_response
+from blog.resources.common import parse_int_param
+
+from blog.resources.schemas import STATISTIC_GET
+
+from config import Config
+
+
+BREAKDOWN_KINDS = {'category', 'user'}
 
 
 class Statistic(Resource):
     """Класс для работы со статистикой."""
 
     @swagger.operation(
+        parameters=[
+            {
+                "name": "exact",
+                "description": "Пересчёт статистики по таблицам с исправлением счётчиков"
+                               "(опционально, boolean значение)",
+                "in": "query",
+                "dataType": "boolean",
+                "paramType": "query"
+            },
+            {
+                "name": "breakdown",
+                "description": "Детализация статистики через ','(опционально): "
+                               "category - в разрезе категорий, "
+                               "user - пользователи с наибольшим количеством постов",
+                "in": "query",
+                "dataType": "string",
+                "paramType": "query"
+            },
+            {
+                "name": "top",
+                "description": "Количество пользователей в детализации user(опционально)",
+                "in": "query",
+                "dataType": "integer",
+                "paramType": "query"
+            }
+        ],
         responseMessages=[
+            {
+                "code": 304,
+                "message": "Данные не изменились(ETag из заголовка If-None-Match актуален)"
+            },
+            {
+                "code": 409,
+                "message": "Не корректные параметры детализации"
+            },
             {
                 "code": 503,
                 "message": "БД временно недоступна"
             }
         ]
     )
+    @conditional('posts', 'comments', 'categories')
     def get(self):
         """GET запрос для получения статистики постов.
 
@@ -32,17 +77,55 @@ class Statistic(Resource):
         'post_count':            int  -  количество постов
         'total_in_posts_table':  int  -  количество постов + черновиков
 
+        По умолчанию значения берутся из поддерживаемых счётчиков.
+        С параметром 'exact': true - статистика пересчитывается
+        по таблицам, а счётчики исправляются.
+
+        С параметром 'breakdown'(значения через ',') добавляются поля:
+
+        'categories':  list  -  при значении category - для каждой категории:
+                                'tag', 'post_count', 'draft_count', 'comment_count'
+        'users':       list  -  при значении user - 'top' пользователей
+                                с наибольшим количеством постов:
+                                'user_id', 'post_count', 'draft_count'
+
+        Ответ содержит заголовок ETag. При совпадении ETag с заголовком
+        If-None-Match возвращается 304 без чтения данных из БД.
+
         В случае ошибки возвращает сообщение соответствующее
         типу ошибки в виде JSON(в поле 'status' находится сообщение ошибки)
         и соответствующий код.
 
         Возможные коды ошибок:
+        При не корректных параметрах детализации - 409
         При невозможности подключения к БД - 503
 
         """
 
         try:
-            statistic = get_statistic()
+            args = STATISTIC_GET.parse()
+
+            breakdown = set()
+            if args['breakdown']:
+                breakdown = set(args['breakdown'].replace(' ', '').split(','))
+
+            if not breakdown <= BREAKDOWN_KINDS:
+                raise Exception('Проверьте корректность параметра breakdown. '
+                                f'Допустимые значения: {", ".join(sorted(BREAKDOWN_KINDS))}.')
+
+            top = parse_int_param(args['top'], 'top',
+                                  default=Config.STATISTIC_TOP_USERS_DEFAULT,
+                                  minimum=1,
+                                  maximum=Config.STATISTIC_TOP_USERS_MAX)
+
+            statistic = get_statistic(exact=args['exact'])
+
+            # Результат get_statistic может быть общим для одновременных
+            # запросов(см. single_flight) и не изменяется
+            if breakdown:
+                statistic = dict(statistic, **get_statistic_breakdown(categories='category' in breakdown,
+                                                                      users='user' in breakdown,
+                                                                      top=top))
         except Exception as e:
             response = make_exception_response(str(e))
             return response
@@ -0,0 +1,199 @@
+import json
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+from datetime import datetime
+
+from loguru import logger
+
+from sqlalchemy import event
+
+from sqlalchemy.engine import Engine
+
+from config import Config
+
+
+# Уровень записей журнала медленных запросов. Ниже DEBUG, поэтому
+# записи попадают только в файл журнала, а не в стандартный вывод.
+SLOW_QUERY_LEVEL = 'SLOW_QUERY'
+
+# Префикс модулей, вызовы из которых указываются в записи(поле caller)
+CALLER_MODULE_PREFIX = 'blog.db_utils.'
+
+# Функции, которые можно выполнять повторно при EXPLAIN ANALYZE(без побочных эффектов)
+READ_ONLY_FUNCTIONS = frozenset(('abs', 'array_agg', 'array_length', 'avg', 'bool_and', 'bool_or',
+                                 'ceil', 'char_length', 'coalesce', 'count', 'date_trunc', 'floor',
+                                 'greatest', 'json_agg', 'json_build_object', 'jsonb_agg',
+                                 'jsonb_build_object', 'least', 'length', 'lower', 'max', 'min',
+                                 'now', 'nullif', 'round', 'string_agg', 'sum', 'unnest', 'upper'))
+
+# Ключевые слова SQL, после которых может следовать "("
+SQL_KEYWORDS = frozenset(('all', 'and', 'any', 'array', 'as', 'between', 'by', 'case', 'cast',
+                          'distinct', 'else', 'exists', 'filter', 'from', 'in', 'join', 'lateral',
+                          'limit', 'not', 'offset', 'on', 'or', 'over', 'row', 'select', 'some',
+                          'then', 'union', 'using', 'values', 'when', 'where', 'with', 'within'))
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_locking_clause = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?UPDATE\b|\bFOR\s+(?:KEY\s+)?SHARE\b'
+                             r'|\bINTO\b', re.IGNORECASE)
+_function_call = re.compile(r'("?)([\w.]+)\1\s*\(')
+
+_captures = queue.Queue(maxsize=Config.SLOW_QUERY_QUEUE_SIZE)
+_dropped = 0
+
+
+def redact(parameters):
+    """Замена значений параметров запроса их типами.
+
+    {'email': 'a@b.c', 'id': 1} -> {'email': 'str', 'id': 'int'}
+
+    """
+
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) if isinstance(value, (dict, list, tuple)) else type(value).__name__
+                for value in parameters]
+
+    return type(parameters).__name__
+
+
+def find_caller():
+    """Метод blog/db_utils, выполнивший запрос(None - если запрос выполнен не из db_utils)."""
+
+    frame = sys._getframe(2)
+
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(CALLER_MODULE_PREFIX):
+            return f'{module}.{frame.f_code.co_name}'
+        frame = frame.f_back
+
+    return None
+
+
+def is_read_only(statement: str):
+    """Проверка, что запрос можно выполнить повторно без побочных эффектов.
+
+    Запрос должен быть SELECT без блокировки строк(FOR UPDATE, FOR SHARE)
+    и SELECT INTO, и вызывать только функции из READ_ONLY_FUNCTIONS
+    (pg_notify, nextval, setval, pg_advisory_xact_lock и т.п. - нет).
+    Вызов неизвестной функции(и всё, что на него похоже) считается
+    побочным эффектом.
+
+    """
+
+    statement = _string_literal.sub("''", statement).strip()
+
+    if not statement.upper().startswith('SELECT') or _locking_clause.search(statement):
+        return False
+
+    for quote, name in _function_call.findall(statement):
+        name = name.lower()
+        if not quote and name in SQL_KEYWORDS:
+            continue
+        if name.startswith('pg_catalog.'):
+            name = name[len('pg_catalog.'):]
+        if name not in READ_ONLY_FUNCTIONS:
+            return False
+
+    return True
+
+
+def explain(engine, statement: str, parameters):
+    """Получение плана выполнения запроса.
+
+    Запросы без побочных эффектов(см. is_read_only) выполняются повторно
+    (EXPLAIN (ANALYZE, BUFFERS)) в транзакции, которая затем отменяется,
+    с ограничением времени Config.SLOW_QUERY_EXPLAIN_TIMEOUT. Для остальных
+    запросов план получается без выполнения(EXPLAIN).
+
+    """
+
+    if is_read_only(statement):
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    else:
+        prefix = 'EXPLAIN '
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SET LOCAL statement_timeout = %s',
+                       (int(Config.SLOW_QUERY_EXPLAIN_TIMEOUT * 1000),))
+        cursor.execute(prefix + statement, parameters)
+        plan = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        connection.rollback()
+        connection.close()
+
+    return plan
+
+
+def _write_forever():
+    while True:
+        capture, engine, parameters = _captures.get()
+
+        if capture.pop('explain'):
+            try:
+                capture['plan'] = explain(engine, capture['statement'], parameters)
+            except Exception as e:
+                capture['plan_error'] = str(e)
+
+        logger.log(SLOW_QUERY_LEVEL, json.dumps(capture, ensure_ascii=False, default=str))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_slow_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global _dropped
+
+    elapsed = time.perf_counter() - conn.info['_slow_query_started'].pop()
+
+    if elapsed < Config.SLOW_QUERY_THRESHOLD:
+        return
+
+    capture = {'time': datetime.now().isoformat(timespec='milliseconds'),
+               'duration_ms': round(elapsed * 1000, 3),
+               'caller': find_caller(),
+               'statement': statement,
+               'parameters': redact(parameters) if Config.SLOW_QUERY_REDACT_PARAMETERS else parameters,
+               'executemany': executemany,
+               'explain': not executemany and random.random() < Config.SLOW_QUERY_EXPLAIN_SAMPLE_RATE}
+
+    # План и запись в файл - в отдельном потоке, запрос не ожидает их
+    try:
+        _captures.put_nowait((capture, conn.engine, parameters))
+    except queue.Full:
+        _dropped += 1
+        logger.warning(f'Очередь журнала медленных запросов переполнена, '
+                       f'пропущено записей: {_dropped}')
+
+
+def _handle_error(context):
+    started = context.connection.info.get('_slow_query_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+if Config.SLOW_QUERY_THRESHOLD is not None:
+    logger.level(SLOW_QUERY_LEVEL, no=1)
+    logger.add(Config.SLOW_QUERY_LOG_PATH,
+               level=SLOW_QUERY_LEVEL,
+               format='{message}',
+               filter=lambda record: record['level'].name == SLOW_QUERY_LEVEL,
+               rotation=Config.SLOW_QUERY_LOG_ROTATION,
+               retention=Config.SLOW_QUERY_LOG_RETENTION)
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+
+    threading.Thread(target=_write_forever, name='slow-query-log', daemon=True).start()
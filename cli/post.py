@@ -79,15 +79,33 @@ def delete_posts(posts_id):
         click.echo(click.style(f"Status code: {response.status_code}", fg='green'))
     else:
         click.echo(click.style(f"Status code: {response.status_code}", fg='red'))
-        click.echo(json.dumps(obj=response.json(),
-                              indent=2,
-                              sort_keys=True,
-                              ensure_ascii=False))
+
+    click.echo(json.dumps(obj=response.json(),
+                          indent=2,
+                          sort_keys=True,
+                          ensure_ascii=False))
 
 
 @click.command(help='Метод получения всех постов')
-def get_all_posts():
-    response = requests.get('http://127.0.0.1:5000/api/v1/posts')
+@click.option('--limit', '-l', help='Количество постов на странице(опционально, '
+                                    'при наличии - посты отдаются постранично)')
+@click.option('--after-id', '-a', help='Id поста, после которого начинается страница(опционально)')
+@click.option('--cursor', '-c', help='Курсор следующей страницы из поля next_cursor(опционально)')
+@click.option('--since', '-s', help='Номер изменения из поля watermark(опционально, '
+                                    'при наличии - отдаются только изменения после него)')
+def get_all_posts(limit, after_id, cursor, since):
+    data = {}
+
+    if limit:
+        data['limit'] = limit
+    if after_id:
+        data['after_id'] = after_id
+    if cursor:
+        data['cursor'] = cursor
+    if since:
+        data['since'] = since
+
+    response = requests.get('http://127.0.0.1:5000/api/v1/posts', data=data)
 
     if response.ok:
         click.echo(click.style(f"Status code: {response.status_code}", fg='green'))
@@ -9,8 +9,20 @@ def statistic():
 
 
 @click.command(help='Метод получения статистики')
-def get_statistic():
-    response = requests.get('http://127.0.0.1:5000/api/v1/statistic')
+@click.option('--exact', '-e', is_flag=True, help='Пересчитать статистику по таблицам')
+@click.option('--breakdown', '-b', help='Детализация через ",": category, user(опционально)')
+@click.option('--top', '-t', help='Количество пользователей в детализации user(опционально)')
+def get_statistic(exact, breakdown, top):
+    data = {}
+
+    if exact:
+        data['exact'] = 'true'
+    if breakdown:
+        data['breakdown'] = breakdown
+    if top:
+        data['top'] = top
+
+    response = requests.get('http://127.0.0.1:5000/api/v1/statistic', data=data)
 
     if response.ok:
         click.echo(click.style(f"Status code: {response.status_code}", fg='green'))
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -12,7 +13,96 @@ class Config(object):
     POST_BODY_MAX_LENGTH = 1000
 
     COMMENT_TITLE_MAX_LENGTH = 100
+    COMMENT_EMAIL_MAX_LENGTH = 100
 
     CATEGORY_NAME_MAX_LENGTH = 100
     TAG_MAX_LENGTH = 25
 
+    POSTS_PAGE_DEFAULT_LIMIT = 50
+    POSTS_PAGE_MAX_LIMIT = 500
+
+    POSTS_BATCH_MAX_SIZE = 10000
+    POSTS_BATCH_INSERT_CHUNK = 1000
+
+    CHANGES_PAGE_DEFAULT_LIMIT = 1000
+    CHANGES_PAGE_MAX_LIMIT = 10000
+
+    COMMENTS_PAGE_DEFAULT_LIMIT = 20
+    COMMENTS_PAGE_MAX_LIMIT = 100
+    COMMENTS_BATCH_MAX_POSTS = 100
+
+    # Поток новых комментариев(Server-Sent Events)
+    COMMENTS_STREAM_MAX_POSTS = 100
+    COMMENTS_STREAM_QUEUE_SIZE = 1000
+    COMMENTS_STREAM_KEEPALIVE = 15
+
+    POSTS_INCLUDE_COMMENTS_DEFAULT = 3
+
+    STREAM_CHUNK_SIZE = 1000
+
+    # Кэш ответов GET запросов(см. blog/resources/cache.py).
+    # Хранилище: 'memory' - память процесса, 'sqlite' - файл, общий для процессов.
+    # Время жизни ответа в секундах задаётся для каждого ресурса,
+    # ответы ресурсов, отсутствующих в RESPONSE_CACHE_TTL, не кэшируются.
+    RESPONSE_CACHE_BACKEND = 'memory'
+    RESPONSE_CACHE_SQLITE_PATH = os.path.join(tempfile.gettempdir(), 'blog_response_cache.sqlite')
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL = {
+        'categories': 300,
+        'comments': 60
+    }
+
+    # Чтение списков Core запросом без создания объектов моделей
+    # и кодирование ответа orjson(при наличии). Параметр запроса
+    # fast=true/false переопределяет значение для ресурса.
+    FAST_READ_PATH = {
+        'posts': True,
+        'comments': True,
+        'categories': True
+    }
+
+    # Соединение LISTEN для получения уведомлений PostgreSQL(NOTIFY)
+    LISTEN_POLL_TIMEOUT = 5
+    LISTEN_RECONNECT_DELAY = 5
+
+    # Объединение одинаковых одновременных вызовов методов чтения
+    # (см. blog/db_utils/single_flight.py)
+    SINGLE_FLIGHT_ENABLED = True
+
+    # Синтетический набор данных для нагрузочного тестирования
+    # (python manage.py generate_data, см. synthetic_data.py).
+    # Масштаб 1 - 100 тыс. постов, 500 тыс. комментариев, 10 категорий.
+    SYNTHETIC_POSTS_PER_SCALE = 100000
+    SYNTHETIC_COMMENTS_PER_POST = 5
+    SYNTHETIC_CATEGORIES_PER_SCALE = 10
+    SYNTHETIC_POSTS_PER_USER = 10
+    SYNTHETIC_DRAFT_SHARE = 0.1
+    SYNTHETIC_NO_CATEGORY_SHARE = 0.1
+    SYNTHETIC_SKEW = 3
+    SYNTHETIC_CHUNK_ROWS = 50000
+
+    # Метрики запросов(количество и время SQL запросов, время кодирования
+    # JSON, размер ответа) в формате Prometheus: GET /api/v1/metrics.
+    # Границы интервалов гистограмм: время - в секундах, размер - в байтах.
+    METRICS_ENABLED = True
+    METRICS_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                            0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    METRICS_SQL_STATEMENTS_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+    METRICS_SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+    # Журнал медленных SQL запросов(см. blog/slow_queries.py).
+    # Запросы дольше SLOW_QUERY_THRESHOLD секунд(None - журнал отключен)
+    # записываются в файл в формате JSON, для доли запросов
+    # SLOW_QUERY_EXPLAIN_SAMPLE_RATE записывается план выполнения.
+    SLOW_QUERY_THRESHOLD = 0.2
+    SLOW_QUERY_REDACT_PARAMETERS = True
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.1
+    SLOW_QUERY_EXPLAIN_TIMEOUT = 10
+    SLOW_QUERY_QUEUE_SIZE = 1000
+    SLOW_QUERY_LOG_PATH = os.path.join(basedir, 'logs', 'slow_queries', 'slow_queries.log')
+    SLOW_QUERY_LOG_ROTATION = '10 MB'
+    SLOW_QUERY_LOG_RETENTION = 10
+
+    STATISTIC_TOP_USERS_DEFAULT = 10
+    STATISTIC_TOP_USERS_MAX = 100
+
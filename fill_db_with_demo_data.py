@@ -8,15 +8,23 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from blog import db
 
+from blog.db_utils.counters import recount_counters
+from blog.db_utils.versions import bump_versions
+
 from blog.models import Category
 from blog.models import Comment
 from blog.models import Post
 
 categories_count = 5
+categories = []
 
 for number in range(categories_count):
     category_for_add = Category(f'Category number {number + 1}', f'#tag{number + 1}')
     db.session.add(category_for_add)
+    categories.append(category_for_add)
+
+# Получение id категорий для ссылок из постов
+db.session.flush()
 
 posts_url = "https://jsonplaceholder.typicode.com/posts"
 comments_url = "https://jsonplaceholder.typicode.com/comments"
@@ -26,16 +34,19 @@ comments = json.loads(urlopen(comments_url).read())
 
 for post in posts:
     category_number = random.randint(0, categories_count)
-    tag = None
+    category_id = None
     if category_number:
-        tag = f'#tag{random.randint(1, categories_count)}'
+        category_id = random.choice(categories).id
     post_for_add = Post(user_id=post['userId'],
                         title=post['title'],
                         body=post['body'],
-                        tag=tag)
+                        category_id=category_id)
 
     db.session.add(post_for_add)
 
+# Посты записываются до комментариев, которые на них ссылаются
+db.session.flush()
+
 for comment in comments:
     comment_for_add = Comment(post_id=comment['postId'],
                               email=comment['email'],
@@ -53,7 +64,14 @@ for draft in posts:
     db.session.add(draft_for_add)
 
 try:
+    # Данные добавлены в обход методов blog/db_utils,
+    # поэтому версии таблиц для ETag увеличиваются явно
+    bump_versions('posts', 'comments', 'categories')
     db.session.commit()
+
+    # Данные добавлены в обход методов blog/db_utils,
+    # поэтому счётчики статистики пересчитываются
+    recount_counters()
 except SQLAlchemyError as e:
     print('Не удалось записать занные в БД.'
           f'Причина: {str(e)}')
@@ -1,3 +1,5 @@
+import os
+
 from flask_migrate import Migrate
 from flask_migrate import MigrateCommand
 
@@ -6,12 +8,32 @@ from flask_script import Manager
 from blog import app
 from blog import db
 
+from config import Config
+
+from synthetic_data import generate
+
 
 migrate = Migrate(app, db)
 
 manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
+
+@manager.option('-s', '--scale', dest='scale', type=float, default=1.0,
+                help='Масштаб набора данных(1 - 100 тыс. постов, 100 - 10 млн. постов)')
+@manager.option('--seed', dest='seed', type=int, default=0,
+                help='Начальное значение генератора случайных чисел')
+@manager.option('-w', '--workers', dest='workers', type=int, default=os.cpu_count(),
+                help='Количество процессов загрузки')
+@manager.option('-c', '--chunk-rows', dest='chunk_rows', type=int,
+                default=Config.SYNTHETIC_CHUNK_ROWS,
+                help='Количество строк в одной команде COPY')
+def generate_data(scale, seed, workers, chunk_rows):
+    """Генерация синтетического набора данных для нагрузочного тестирования."""
+
+    generate(scale=scale, seed=seed, workers=workers, chunk_rows=chunk_rows)
+
+
 if __name__ == '__main__':
     manager.run()
 
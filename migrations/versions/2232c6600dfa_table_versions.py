@@ -0,0 +1,31 @@
+"""table versions
+
+Revision ID: 2232c6600dfa
+Revises: ae46e42faa49
+Create Date: 2026-10-18 11:22:25.860191
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2232c6600dfa'
+down_revision = 'ae46e42faa49'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    op.execute("INSERT INTO table_versions (name, version) "
+               "VALUES ('posts', 1), ('comments', 1), ('categories', 1)")
+
+
+def downgrade():
+    op.drop_table('table_versions')
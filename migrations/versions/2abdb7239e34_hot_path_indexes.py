@@ -0,0 +1,47 @@
+"""hot path indexes
+
+Revision ID: 2abdb7239e34
+Revises: c35c06d3c7ba
+Create Date: 2026-10-18 11:10:37.491513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2abdb7239e34'
+down_revision = 'c35c06d3c7ba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индексы создаются без блокировки записи в таблицы(CONCURRENTLY),
+    # что невозможно внутри транзакции.
+    with op.get_context().autocommit_block():
+        # Частичный индекс для выборки опубликованных постов(не черновиков)
+        # с пагинацией по id и подсчёта их количества.
+        op.create_index('ix_posts_published_id', 'posts', ['id'],
+                        postgresql_where=sa.text('NOT is_draft'),
+                        postgresql_concurrently=True)
+        op.create_index('ix_posts_category_id', 'posts', ['category_id'],
+                        postgresql_concurrently=True)
+        op.create_index('ix_posts_user_id', 'posts', ['user_id'],
+                        postgresql_concurrently=True)
+        # Составной индекс обслуживает и фильтр по post_id,
+        # и сортировку/пагинацию комментариев поста по id.
+        op.create_index('ix_comments_post_id', 'comments', ['post_id', 'id'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_comments_post_id', table_name='comments',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_posts_user_id', table_name='posts',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_posts_category_id', table_name='posts',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_posts_published_id', table_name='posts',
+                      postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""statistic counters
+
+Revision ID: 3341f9b7a783
+Revises: 2abdb7239e34
+Create Date: 2026-10-18 11:11:11.019224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3341f9b7a783'
+down_revision = '2abdb7239e34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.BigInteger(), nullable=False),
+    sa.Column('draft_count', sa.BigInteger(), nullable=False),
+    sa.Column('categories_count', sa.BigInteger(), nullable=False),
+    sa.Column('comment_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Начальные значения счётчиков по текущим данным
+    op.execute('INSERT INTO counters (id, post_count, draft_count, categories_count, comment_count) '
+               'SELECT 1, '
+               '(SELECT count(*) FROM posts WHERE NOT is_draft), '
+               '(SELECT count(*) FROM posts WHERE is_draft), '
+               '(SELECT count(*) FROM categories), '
+               '(SELECT count(*) FROM comments)')
+
+
+def downgrade():
+    op.drop_table('counters')
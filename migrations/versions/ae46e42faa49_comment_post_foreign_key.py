@@ -0,0 +1,39 @@
+"""comment post foreign key
+
+Revision ID: ae46e42faa49
+Revises: 3341f9b7a783
+Create Date: 2026-10-18 11:16:52.562644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ae46e42faa49'
+down_revision = '3341f9b7a783'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Комментарии, адресованные несуществующим постам, удаляются
+    # до создания ограничения, счётчик комментариев пересчитывается.
+    op.execute('DELETE FROM comments WHERE NOT EXISTS '
+               '(SELECT 1 FROM posts WHERE posts.id = comments.post_id)')
+    op.execute('UPDATE counters SET comment_count = (SELECT count(*) FROM comments)')
+
+    # Ограничение создаётся без проверки существующих строк(NOT VALID),
+    # поэтому блокировка, запрещающая запись в comments, не удерживается
+    # на время просмотра таблицы. Новые строки проверяются сразу.
+    op.execute('ALTER TABLE comments ADD CONSTRAINT comments_post_id_fkey '
+               'FOREIGN KEY (post_id) REFERENCES posts (id) NOT VALID')
+
+    # Проверка существующих строк - в отдельной транзакции после commit
+    # создания ограничения(VALIDATE CONSTRAINT не блокирует запись)
+    with op.get_context().autocommit_block():
+        op.execute('ALTER TABLE comments VALIDATE CONSTRAINT comments_post_id_fkey')
+
+
+def downgrade():
+    op.drop_constraint('comments_post_id_fkey', 'comments', type_='foreignkey')
@@ -0,0 +1,125 @@
+"""change feed
+
+Revision ID: b3703e2e374f
+Revises: 2232c6600dfa
+Create Date: 2026-10-18 11:26:56.090597
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3703e2e374f'
+down_revision = '2232c6600dfa'
+branch_labels = None
+depends_on = None
+
+
+# Таблицы, строки которых хранят номер последнего изменения
+TABLES = ('posts', 'comments', 'categories')
+
+# Количество строк, которым номера изменений присваиваются в одной транзакции
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade():
+    op.execute('CREATE SEQUENCE change_seq')
+
+    # Номер изменения(change_seq) задаёт порядок изменений, id транзакции
+    # (change_xid) - границу чтения ленты изменений: транзакции с id меньше
+    # xmin снимка данных завершены, и все их изменения уже видны(см. get_changes).
+    # Поэтому номера получаются без блокировок и не зависят от порядка commit.
+    op.execute("""
+        CREATE FUNCTION set_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := nextval('change_seq');
+            NEW.change_xid := txid_current();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.create_table('tombstones',
+    sa.Column('change_seq', sa.BigInteger(), server_default=sa.text("nextval('change_seq')"), nullable=False),
+    sa.Column('change_xid', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False),
+    sa.Column('table_name', sa.String(length=20), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('change_seq')
+    )
+    op.create_index('ix_tombstones_change_xid', 'tombstones', ['change_xid', 'change_seq'])
+
+    op.execute("""
+        CREATE FUNCTION add_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tombstones (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Колонки добавляются без значения по умолчанию(без перезаписи таблицы),
+    # значение по умолчанию затем применяется только к новым строкам
+    for table in TABLES:
+        op.add_column(table, sa.Column('change_seq', sa.BigInteger(), nullable=True))
+        op.add_column(table, sa.Column('change_xid', sa.BigInteger(), nullable=True))
+        op.alter_column(table, 'change_seq', server_default=sa.text("nextval('change_seq')"))
+        op.alter_column(table, 'change_xid', server_default=sa.text('txid_current()'))
+
+        op.execute(f'CREATE TRIGGER {table}_change_seq BEFORE UPDATE ON {table} '
+                   'FOR EACH ROW EXECUTE PROCEDURE set_change_seq()')
+        op.execute(f'CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} '
+                   'FOR EACH ROW EXECUTE PROCEDURE add_tombstone()')
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            # Существующим строкам номера присваиваются порциями по id,
+            # каждая порция - в отдельной транзакции(COMMIT в DO, PostgreSQL 11+)
+            op.execute(f"""
+                DO $$
+                DECLARE
+                    last_id integer := 0;
+                    max_id integer;
+                BEGIN
+                    SELECT max(id) INTO max_id FROM {table};
+                    WHILE last_id < coalesce(max_id, 0) LOOP
+                        UPDATE {table} SET change_seq = nextval('change_seq')
+                        WHERE id > last_id AND id <= last_id + {BACKFILL_BATCH_SIZE}
+                          AND change_seq IS NULL;
+                        last_id := last_id + {BACKFILL_BATCH_SIZE};
+                        COMMIT;
+                    END LOOP;
+                END
+                $$
+            """)
+
+            # Проверка NOT VALID не блокирует запись в таблицу на время проверки строк,
+            # SET NOT NULL использует проверенное ограничение без повторного чтения таблицы
+            op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_change_seq_not_null '
+                       'CHECK (change_seq IS NOT NULL AND change_xid IS NOT NULL) NOT VALID')
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_change_seq_not_null')
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN change_seq SET NOT NULL, '
+                       'ALTER COLUMN change_xid SET NOT NULL')
+            op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_change_seq_not_null')
+
+            op.create_index(f'ix_{table}_change_xid', table, ['change_xid', 'change_seq'],
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_change_xid', table_name=table,
+                          postgresql_concurrently=True)
+
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_tombstone ON {table}')
+        op.execute(f'DROP TRIGGER {table}_change_seq ON {table}')
+        op.drop_column(table, 'change_xid')
+        op.drop_column(table, 'change_seq')
+
+    op.execute('DROP FUNCTION add_tombstone()')
+    op.drop_index('ix_tombstones_change_xid', table_name='tombstones')
+    op.drop_table('tombstones')
+    op.execute('DROP FUNCTION set_change_seq()')
+    op.execute('DROP SEQUENCE change_seq')
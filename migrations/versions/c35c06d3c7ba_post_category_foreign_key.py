@@ -0,0 +1,39 @@
+"""post category foreign key
+
+Revision ID: c35c06d3c7ba
+Revises: ea53b637c515
+Create Date: 2026-10-18 11:09:36.514576
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c35c06d3c7ba'
+down_revision = 'ea53b637c515'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('posts', sa.Column('category_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('posts_category_id_fkey', 'posts', 'categories',
+                          ['category_id'], ['id'], ondelete='SET NULL')
+
+    # Перенос ссылок на категории из строковых тэгов.
+    # Тэги, для которых категория не найдена, не переносятся(пост остаётся без категории).
+    op.execute('UPDATE posts SET category_id = categories.id '
+               'FROM categories WHERE posts.tag = categories.tag')
+
+    op.drop_column('posts', 'tag')
+
+
+def downgrade():
+    op.add_column('posts', sa.Column('tag', sa.String(length=25), nullable=True))
+
+    op.execute('UPDATE posts SET tag = categories.tag '
+               'FROM categories WHERE posts.category_id = categories.id')
+
+    op.drop_constraint('posts_category_id_fkey', 'posts', type_='foreignkey')
+    op.drop_column('posts', 'category_id')
@@ -0,0 +1,287 @@
+import io
+import multiprocessing
+import random
+import time
+
+import psycopg2
+
+from blog import app
+from blog import db
+
+from blog.db_utils.counters import recount_counters
+from blog.db_utils.versions import bump_versions
+
+from config import Config
+
+
+# Множитель для перемешивания номеров популярности(простое число больше
+# количества строк, поэтому (rank * SCATTER) % n - перестановка 0..n-1)
+SCATTER = 2654435761
+
+TABLES = ('posts', 'comments', 'categories')
+
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing',
+         'elit', 'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'ut', 'labore',
+         'et', 'dolore', 'magna', 'aliqua', 'enim', 'ad', 'minim', 'veniam',
+         'quis', 'nostrud', 'exercitation', 'ullamco', 'laboris', 'nisi',
+         'aliquip', 'ex', 'ea', 'commodo', 'consequat', 'duis', 'aute', 'irure',
+         'in', 'reprehenderit', 'voluptate', 'velit', 'esse', 'cillum', 'eu',
+         'fugiat', 'nulla', 'pariatur', 'excepteur', 'sint', 'occaecat',
+         'cupidatat', 'non', 'proident', 'sunt', 'culpa', 'qui', 'officia',
+         'deserunt', 'mollit', 'anim', 'id', 'est', 'laborum')
+
+
+def get_sizes(scale: float):
+    """Метод вычисления количества строк набора данных.
+
+    В качестве входного параметра принимает:
+
+    scale:  float  -  масштаб набора данных(1 - Config.SYNTHETIC_POSTS_PER_SCALE постов)
+
+    Возвращает словарь {'posts': int, 'comments': int, 'categories': int, 'users': int}.
+
+    """
+
+    posts = max(1, int(Config.SYNTHETIC_POSTS_PER_SCALE * scale))
+
+    return {'posts': posts,
+            'comments': posts * Config.SYNTHETIC_COMMENTS_PER_POST,
+            'categories': max(1, int(Config.SYNTHETIC_CATEGORIES_PER_SCALE * scale)),
+            'users': max(1, posts // Config.SYNTHETIC_POSTS_PER_USER)}
+
+
+def skewed(rng: random.Random, n: int):
+    """Номер(0..n-1) с неравномерным распределением.
+
+    Номер популярности выбирается степенным распределением
+    (доля 1% самых популярных - около 0.01 ** (1 / Config.SYNTHETIC_SKEW)
+    всех выборов) и перемешивается, что бы популярные строки
+    не были сосредоточены в начале таблицы.
+
+    """
+
+    rank = min(n - 1, int(n * rng.random() ** Config.SYNTHETIC_SKEW))
+
+    return rank * SCATTER % n
+
+
+def make_text(rng: random.Random, min_words: int, max_words: int, max_length: int):
+    text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+    return text[:max_length].strip().capitalize()
+
+
+def generate_posts(rng: random.Random, first_id: int, count: int, sizes: dict):
+    # Строки в текстовом формате COPY(слова не содержат спецсимволов формата)
+    for post_id in range(first_id, first_id + count):
+        category_id = '\\N'
+        if rng.random() >= Config.SYNTHETIC_NO_CATEGORY_SHARE:
+            category_id = skewed(rng, sizes['categories']) + 1
+
+        yield (f'{post_id}\t{skewed(rng, sizes["users"]) + 1}\t'
+               f'{make_text(rng, 3, 10, Config.POST_TITLE_MAX_LENGTH)}\t'
+               f'{make_text(rng, 20, 150, Config.POST_BODY_MAX_LENGTH)}\t'
+               f'{"t" if rng.random() < Config.SYNTHETIC_DRAFT_SHARE else "f"}\t'
+               f'{category_id}\n')
+
+
+def generate_comments(rng: random.Random, first_id: int, count: int, sizes: dict):
+    for comment_id in range(first_id, first_id + count):
+        user = skewed(rng, sizes['users']) + 1
+
+        yield (f'{comment_id}\t{skewed(rng, sizes["posts"]) + 1}\t'
+               f'user{user}@example.com\t'
+               f'{make_text(rng, 1, 3, Config.COMMENT_TITLE_MAX_LENGTH)}\t'
+               f'{make_text(rng, 5, 60, Config.POST_BODY_MAX_LENGTH)}\n')
+
+
+COLUMNS = {
+    'posts': ('id', 'user_id', 'title', 'body', 'is_draft', 'category_id'),
+    'comments': ('id', 'post_id', 'email', 'name', 'body')
+}
+
+GENERATORS = {
+    'posts': generate_posts,
+    'comments': generate_comments
+}
+
+
+def copy_chunk(task: tuple):
+    """Загрузка части таблицы командой COPY в отдельном соединении.
+
+    Строки части определяются только seed, таблицей и номером
+    первой строки, поэтому набор данных не зависит от количества
+    процессов загрузки.
+
+    """
+
+    table, first_id, count, sizes, seed = task
+
+    rng = random.Random(f'{seed}:{table}:{first_id}')
+    data = io.StringIO(''.join(GENERATORS[table](rng, first_id, count, sizes)))
+
+    connection = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({", ".join(COLUMNS[table])}) FROM STDIN', data)
+    finally:
+        connection.close()
+
+    return table, count
+
+
+def run_statement(statement: str):
+    connection = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        connection.close()
+
+    return statement
+
+
+def restore_secondary_objects(pool, indexes: list, foreign_keys: list):
+    # Индексы создаются параллельно, внешние ключи - после индексов
+    def report(statement, error):
+        if error is None:
+            print(statement)
+        else:
+            print(f'Не удалось выполнить: {statement}. Причина: {error}')
+
+    for statement, error in pool.imap_unordered(try_statement, indexes):
+        report(statement, error)
+
+    for statement in foreign_keys:
+        report(*try_statement(statement))
+
+
+def try_statement(statement: str):
+    try:
+        run_statement(statement)
+    except Exception as e:
+        return statement, str(e)
+
+    return statement, None
+
+
+def drop_secondary_objects(cursor):
+    """Удаление внешних ключей и индексов(кроме первичных ключей) таблиц.
+
+    Возвращает списки команд для их восстановления после загрузки:
+    (индексы, внешние ключи).
+
+    """
+
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND conrelid::regclass::text IN ('posts', 'comments')
+    """)
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index AS i
+        WHERE i.indrelid::regclass::text IN ('posts', 'comments')
+          AND NOT i.indisprimary
+          AND i.indexrelid NOT IN (SELECT conindid FROM pg_constraint)
+    """)
+    indexes = cursor.fetchall()
+
+    for table, name, _ in foreign_keys:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX {name}')
+
+    return ([definition for _, definition in indexes],
+            [f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'
+             for table, name, definition in foreign_keys])
+
+
+def generate(scale: float, seed: int, workers: int, chunk_rows: int):
+    """Метод генерации синтетического набора данных для нагрузочного тестирования.
+
+    В качестве входных параметров принимает:
+
+    scale:       float  -  масштаб набора данных(см. get_sizes)
+    seed:        int    -  начальное значение генератора случайных чисел
+                           (одинаковые scale и seed дают одинаковые данные)
+    workers:     int    -  количество процессов загрузки
+    chunk_rows:  int    -  количество строк в одной команде COPY
+
+    Набор данных загружается только в пустые таблицы posts, comments
+    и categories. Посты и комментарии загружаются командами COPY
+    частями параллельно, на время загрузки удаляются внешние ключи
+    и индексы(кроме первичных ключей), затем они создаются заново.
+
+    Популярность авторов, категорий и постов(по количеству
+    комментариев) распределена неравномерно(см. skewed).
+
+    Номера изменений(change_seq, change_xid) присваиваются
+    значениями по умолчанию колонок, как и при добавлении строк API.
+
+    После загрузки устанавливаются значения последовательностей id,
+    пересчитываются счётчики статистики и увеличиваются версии таблиц.
+
+    В случае ошибки происходит raise Exception с сообщением,
+    соответствующим причине ошибки.
+
+    """
+
+    sizes = get_sizes(scale)
+    started = time.monotonic()
+
+    connection = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+    try:
+        with connection, connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {table})')
+                if cursor.fetchone()[0]:
+                    raise Exception(f'Не удалось сгенерировать данные. '
+                                    f'Причина: таблица {table} не пустая.')
+
+            cursor.execute('INSERT INTO categories (id, name, tag) '
+                           'SELECT n, %s || n, %s || n FROM generate_series(1, %s) AS n',
+                           ('Category number ', '#tag', sizes['categories']))
+
+            indexes, foreign_keys = drop_secondary_objects(cursor)
+    finally:
+        connection.close()
+
+    print(f'Генерация: {sizes["posts"]} постов, {sizes["comments"]} комментариев, '
+          f'{sizes["categories"]} категорий, {workers} процессов')
+
+    tasks = [(table, first_id, min(chunk_rows, sizes[table] - first_id + 1), sizes, seed)
+             for table in ('posts', 'comments')
+             for first_id in range(1, sizes[table] + 1, chunk_rows)]
+
+    loaded = {'posts': 0, 'comments': 0}
+
+    with multiprocessing.Pool(workers) as pool:
+        try:
+            for table, count in pool.imap_unordered(copy_chunk, tasks):
+                loaded[table] += count
+                print(f'\r{loaded["posts"]}/{sizes["posts"]} постов, '
+                      f'{loaded["comments"]}/{sizes["comments"]} комментариев', end='')
+
+            print(f'\nЗагружено за {time.monotonic() - started:.1f} с')
+
+        finally:
+            # Индексы и внешние ключи восстанавливаются и при ошибке загрузки
+            restore_secondary_objects(pool, indexes, foreign_keys)
+
+    with app.app_context():
+        for table in TABLES:
+            db.session.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                               f"(SELECT max(id) FROM {table}))")
+        recount_counters()
+        bump_versions(*TABLES)
+        db.session.commit()
+
+    for table in TABLES:
+        run_statement(f'ANALYZE {table}')
+
+    print(f'Готово за {time.monotonic() - started:.1f} с')